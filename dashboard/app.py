@@ -7,17 +7,16 @@ import plotly.graph_objects as go
 from datetime import datetime
 import sys
 import os
+from typing import Dict, List
 
 # Ajouter le chemin pour les imports
 sys.path.append(os.path.dirname(__file__))
 
 from utils.data_loader import (
-    load_all_kpis,
-    load_all_facts,
-    load_all_analytics,
-    load_all_kpis_api,
-    load_all_facts_api,
-    load_all_analytics_api,
+    DataBundle,
+    load_table,
+    get_last_refresh,
+    clear_api_caches,
 )
 
 # Configuration de la page
@@ -48,20 +47,42 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-@st.cache_data(ttl=300)  # Cache pour 5 minutes
+# Tables affichées par chaque page, préchargées en parallèle
+# (l'évolution temporelle ne charge que la granularité choisie, à l'accès)
+PAGE_TABLES: Dict[str, Dict[str, List[str]]] = {
+    "🏠 Accueil - KPIs Globaux": {"kpis": ["globaux"], "facts": ["ca_mois"]},
+    "📈 Évolution Temporelle": {},
+    "🌍 Analyse Géographique": {"facts": ["ca_pays"]},
+    "🎯 Segmentation RFM": {"kpis": ["rfm"]},
+    "💰 Customer Lifetime Value": {"kpis": ["clv_pays"]},
+    "🔄 Rétention & Churn": {"kpis": ["retention_global", "retention_summary"]},
+    "📦 Performance Produits": {"kpis": ["produits", "top_produits_ca"]},
+    "📅 Saisonnalité": {"analytics": ["saisonnalite_jour", "saisonnalite_heure", "saisonnalite_mois"]},
+    "📊 Analyses Avancées": {"analytics": ["concentration_summary", "cohortes_total"]},
+}
+
+
+@st.cache_resource
+def _last_refresh_seen() -> dict:
+    return {"refreshed_at": None}
+
+
 def load_data(source: str):
-    """Charge toutes les données avec cache, soit depuis MinIO, soit via l'API MongoDB."""
-    if source == "MinIO (direct)":
-        with st.spinner("Chargement des données depuis Gold (MinIO)..."):
-            kpis = load_all_kpis()
-            facts = load_all_facts()
-            analytics = load_all_analytics()
-    else:
-        with st.spinner("Chargement des données via l'API (MongoDB)..."):
-            kpis = load_all_kpis_api()
-            facts = load_all_facts_api()
-            analytics = load_all_analytics_api()
-    return kpis, facts, analytics
+    """Prépare l'accès aux données (chargées à la demande), soit depuis MinIO, soit via l'API MongoDB."""
+    from_api = source != "MinIO (direct)"
+    if from_api:
+        # Nouvelle synchro Mongo: ne pas resservir les anciennes collections depuis les caches API
+        refreshed_at = get_last_refresh()
+        seen = _last_refresh_seen()
+        if refreshed_at is not None and refreshed_at != seen["refreshed_at"]:
+            clear_api_caches()
+            seen["refreshed_at"] = refreshed_at
+    # Sinon, chaque table expire selon la TTL de son cache (FAST / CACHE / STABLE)
+
+    def loader(group: str, key: str):
+        return load_table(group, key, from_api=from_api)
+
+    return DataBundle("kpis", loader), DataBundle("facts", loader), DataBundle("analytics", loader)
 
 
 def main():
@@ -101,14 +122,25 @@ def main():
         from utils.data_loader import benchmark_sources
         with st.sidebar.spinner("Mesure en cours..."):
             times = benchmark_sources()
-        st.sidebar.metric("MinIO direct", f"{times['minio_total']:.3f} s")
-        st.sidebar.metric("API Mongo", f"{times['api_total']:.3f} s")
+        st.sidebar.metric("MinIO direct (p50)", f"{times['minio_total']:.3f} s")
+        st.sidebar.caption(f"p95: {times['minio_p95']:.3f} s")
+        st.sidebar.metric("API Mongo (p50)", f"{times['api_total']:.3f} s")
+        st.sidebar.caption(f"p95: {times['api_p95']:.3f} s")
         if times['api_total'] > 0:
             ratio = times['api_total'] / times['minio_total']
             st.sidebar.caption(f"API est {ratio:.2f}x {'plus lente' if ratio > 1 else 'plus rapide'} que MinIO")
     
-    # Charger les données
+    # Charger uniquement les tables de la page
     kpis, facts, analytics = load_data(source)
+    bundles = {"kpis": kpis, "facts": facts, "analytics": analytics}
+    spinner_text = (
+        "Chargement des données depuis Gold (MinIO)..."
+        if source == "MinIO (direct)"
+        else "Chargement des données via l'API (MongoDB)..."
+    )
+    with st.spinner(spinner_text):
+        for group, keys in PAGE_TABLES.get(page, {}).items():
+            bundles[group].prefetch(keys)
     
     # Router vers la bonne page
     if page == "🏠 Accueil - KPIs Globaux":
@@ -131,7 +163,7 @@ def main():
         show_advanced_analytics(analytics)
 
 
-def show_home_page(kpis: dict, facts: dict):
+def show_home_page(kpis: DataBundle, facts: DataBundle):
     """Page d'accueil avec KPIs globaux"""
     st.header("🏠 Vue d'ensemble")
     
@@ -191,8 +223,9 @@ def show_home_page(kpis: dict, facts: dict):
     # Graphique CA par mois
     if not facts['ca_mois'].empty:
         st.subheader("📈 Évolution du CA mensuel")
-        ca_mois = facts['ca_mois'].copy()
-        ca_mois['annee_mois'] = pd.to_datetime(ca_mois['annee_mois'])
+        ca_mois = facts['ca_mois']
+        # assign: nouvelle colonne sans copie complète préalable du DataFrame
+        ca_mois = ca_mois.assign(annee_mois=pd.to_datetime(ca_mois['annee_mois']))
         
         fig = px.line(
             ca_mois,
@@ -214,7 +247,7 @@ def show_home_page(kpis: dict, facts: dict):
             )
 
 
-def show_temporal_analysis(facts: dict):
+def show_temporal_analysis(facts: DataBundle):
     """Analyse temporelle"""
     st.header("📈 Évolution Temporelle")
     
@@ -225,22 +258,22 @@ def show_temporal_analysis(facts: dict):
     )
     
     if granularite == "Par jour" and not facts['ca_jour'].empty:
-        df = facts['ca_jour'].copy()
-        df['date'] = pd.to_datetime(df['date'])
+        df = facts['ca_jour']
+        df = df.assign(date=pd.to_datetime(df['date']))
         x_col = 'date'
         title = "CA par Jour"
     elif granularite == "Par semaine" and not facts['ca_semaine'].empty:
-        df = facts['ca_semaine'].copy()
-        df['date_debut'] = pd.to_datetime(df['date_debut'])
+        df = facts['ca_semaine']
+        df = df.assign(date_debut=pd.to_datetime(df['date_debut']))
         x_col = 'date_debut'
         title = "CA par Semaine"
     elif granularite == "Par mois" and not facts['ca_mois'].empty:
-        df = facts['ca_mois'].copy()
-        df['annee_mois'] = pd.to_datetime(df['annee_mois'])
+        df = facts['ca_mois']
+        df = df.assign(annee_mois=pd.to_datetime(df['annee_mois']))
         x_col = 'annee_mois'
         title = "CA par Mois"
     elif granularite == "Par heure" and not facts['ca_heure'].empty:
-        df = facts['ca_heure'].copy()
+        df = facts['ca_heure']
         x_col = 'heure'
         title = "CA par Heure de la Journée"
     else:
@@ -267,7 +300,7 @@ def show_temporal_analysis(facts: dict):
         st.metric("CA Max", f"€{df['ca_total'].max():,.2f}")
 
 
-def show_geographic_analysis(facts: dict, kpis: dict):
+def show_geographic_analysis(facts: DataBundle, kpis: DataBundle):
     """Analyse géographique"""
     st.header("🌍 Analyse Géographique")
     
@@ -275,7 +308,7 @@ def show_geographic_analysis(facts: dict, kpis: dict):
         st.warning("Données géographiques non disponibles")
         return
     
-    df = facts['ca_pays'].copy()
+    df = facts['ca_pays']
     
     # Graphique en barres
     fig = px.bar(
@@ -312,7 +345,7 @@ def show_geographic_analysis(facts: dict, kpis: dict):
         st.plotly_chart(fig_pie, use_container_width=True)
 
 
-def show_rfm_analysis(kpis: dict):
+def show_rfm_analysis(kpis: DataBundle):
     """Analyse RFM"""
     st.header("🎯 Segmentation RFM")
     
@@ -320,7 +353,7 @@ def show_rfm_analysis(kpis: dict):
         st.warning("Données RFM non disponibles")
         return
     
-    df = kpis['rfm'].copy()
+    df = kpis['rfm']
     
     # Graphique en barres par segment
     fig = px.bar(
@@ -339,7 +372,7 @@ def show_rfm_analysis(kpis: dict):
     st.dataframe(df, use_container_width=True)
 
 
-def show_clv_analysis(kpis: dict):
+def show_clv_analysis(kpis: DataBundle):
     """Analyse CLV"""
     st.header("💰 Customer Lifetime Value")
     
@@ -347,7 +380,7 @@ def show_clv_analysis(kpis: dict):
         st.warning("Données CLV non disponibles")
         return
     
-    df = kpis['clv_pays'].copy()
+    df = kpis['clv_pays']
     
     # Graphique CLV par pays
     fig = px.bar(
@@ -365,7 +398,7 @@ def show_clv_analysis(kpis: dict):
     st.dataframe(df, use_container_width=True)
 
 
-def show_retention_analysis(kpis: dict):
+def show_retention_analysis(kpis: DataBundle):
     """Analyse de rétention"""
     st.header("🔄 Rétention & Churn")
     
@@ -405,7 +438,7 @@ def show_retention_analysis(kpis: dict):
         st.plotly_chart(fig, use_container_width=True)
 
 
-def show_product_analysis(kpis: dict):
+def show_product_analysis(kpis: DataBundle):
     """Analyse produits"""
     st.header("📦 Performance Produits")
     
@@ -432,14 +465,14 @@ def show_product_analysis(kpis: dict):
         st.dataframe(kpis['produits'], use_container_width=True)
 
 
-def show_seasonality_analysis(analytics: dict):
+def show_seasonality_analysis(analytics: DataBundle):
     """Analyse de saisonnalité"""
     st.header("📅 Saisonnalité")
     
     # Par jour de la semaine
     if not analytics['saisonnalite_jour'].empty:
         st.subheader("📆 Par jour de la semaine")
-        df = analytics['saisonnalite_jour'].copy()
+        df = analytics['saisonnalite_jour']
         fig = px.bar(
             df,
             x='jour_semaine',
@@ -452,7 +485,7 @@ def show_seasonality_analysis(analytics: dict):
     # Par heure
     if not analytics['saisonnalite_heure'].empty:
         st.subheader("🕐 Par heure de la journée")
-        df = analytics['saisonnalite_heure'].copy()
+        df = analytics['saisonnalite_heure']
         fig = px.line(
             df,
             x='heure',
@@ -465,7 +498,7 @@ def show_seasonality_analysis(analytics: dict):
     # Par mois
     if not analytics['saisonnalite_mois'].empty:
         st.subheader("📅 Par mois")
-        df = analytics['saisonnalite_mois'].copy()
+        df = analytics['saisonnalite_mois']
         fig = px.bar(
             df,
             x='mois_nom',
@@ -476,7 +509,7 @@ def show_seasonality_analysis(analytics: dict):
         st.plotly_chart(fig, use_container_width=True)
 
 
-def show_advanced_analytics(analytics: dict):
+def show_advanced_analytics(analytics: DataBundle):
     """Analyses avancées"""
     st.header("📊 Analyses Avancées")
     
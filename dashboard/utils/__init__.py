@@ -1,8 +1,17 @@
 """Utilitaires pour le dashboard"""
 
-from .data_loader import load_parquet_from_gold, load_all_kpis, load_all_facts, load_all_analytics
+from .data_loader import (
+    DataBundle,
+    load_table,
+    load_parquet_from_gold,
+    load_all_kpis,
+    load_all_facts,
+    load_all_analytics,
+)
 
 __all__ = [
+    "DataBundle",
+    "load_table",
     "load_parquet_from_gold",
     "load_all_kpis",
     "load_all_facts",
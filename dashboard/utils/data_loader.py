@@ -1,35 +1,74 @@
 """Utilitaires pour charger les données depuis MinIO Gold ou via l'API MongoDB"""
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
 import os
+import statistics
 import sys
 import time
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 
 import pandas as pd
+import pyarrow.parquet as pq
 import requests
-from minio.error import S3Error
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Ajouter le chemin parent pour importer config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from flows.config import BUCKET_GOLD, get_minio_client
+from flows.config import BUCKET_GOLD, get_arrow_filesystem
 
 
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 
+# Téléchargements indépendants (I/O) : un thread par table d'un groupe
+MAX_WORKERS = 9
+
+# Nombre d'essais du benchmark MinIO vs API (p50 / p95)
+BENCHMARK_TRIALS = 5
+
+# Session HTTP partagée : connexions keep-alive réutilisées entre les appels API
+_SESSION = requests.Session()
+
+# Durées de validité du cache (secondes), selon la fréquence de mise à jour des tables.
+# Ces caches par table sont la seule expiration dans le temps: le dashboard ne doit pas
+# les recouvrir d'un cache sans TTL, sinon ces durées ne sont jamais atteintes.
+CACHE_TTL = 300
+FAST_TTL = 60           # CA horaire / journalier: bougent à chaque chargement
+STABLE_TTL = 24 * 3600  # saisonnalité / cohortes: ne bougent qu'au recalcul complet
+
+# Interrogation de /meta/last-refresh au plus une fois par intervalle (pas à chaque rerun)
+REFRESH_PROBE_TTL = 30
+
+FAST_TABLES = frozenset({"ca_jour", "ca_heure"})
+STABLE_TABLES = frozenset({
+    "saisonnalite_jour",
+    "saisonnalite_heure",
+    "saisonnalite_mois",
+    "cohortes_total",
+})
+
+
+def _executor(max_workers: int) -> ThreadPoolExecutor:
+    """Pool de threads rattachés au script Streamlit en cours (caches st.cache_data sans avertissement)."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=add_script_run_ctx, initargs=(None, ctx))
 
-def load_parquet_from_gold(object_path: str) -> pd.DataFrame:
-    """Charge un fichier Parquet depuis MinIO Gold."""
-    client = get_minio_client()
+
+def _read_parquet_from_gold(object_path: str) -> pd.DataFrame:
+    """Lit un fichier Parquet depuis MinIO Gold (sans cache)."""
+    fs = get_arrow_filesystem()
 
     try:
-        response = client.get_object(BUCKET_GOLD, object_path)
-        df = pd.read_parquet(BytesIO(response.read()))
-        response.close()
-        response.release_conn()
-        return df
-    except S3Error as e:
+        # Arrow lit l'objet par plages directement depuis MinIO (pas de copie bytes + BytesIO);
+        # conversion colonne par colonne, buffers Arrow libérés au fil de l'eau
+        table = pq.read_table(f"{BUCKET_GOLD}/{object_path}", filesystem=fs)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    except OSError as e:
         print(f"Erreur lors du chargement de {object_path}: {e}")
         return pd.DataFrame()
     except Exception as e:
@@ -37,53 +76,91 @@ def load_parquet_from_gold(object_path: str) -> pd.DataFrame:
         return pd.DataFrame()
 
 
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_parquet_from_gold(object_path: str) -> pd.DataFrame:
+    """Charge un fichier Parquet depuis MinIO Gold."""
+    return _read_parquet_from_gold(object_path)
+
+
+@st.cache_data(ttl=FAST_TTL, show_spinner=False)
+def _load_parquet_fast(object_path: str) -> pd.DataFrame:
+    return _read_parquet_from_gold(object_path)
+
+
+@st.cache_data(ttl=STABLE_TTL, show_spinner=False)
+def _load_parquet_stable(object_path: str) -> pd.DataFrame:
+    return _read_parquet_from_gold(object_path)
+
+
 # === Chargement direct depuis GOLD (MinIO) ===
 
+KPI_PATHS: Dict[str, str] = {
+    "globaux": "kpis/kpi_globaux.parquet",
+    "croissance": "kpis/kpi_croissance_mensuelle.parquet",
+    "rfm": "kpis/kpi_rfm.parquet",
+    "clv_detail": "kpis/kpi_clv_detail.parquet",
+    "clv_pays": "kpis/kpi_clv_pays.parquet",
+    "retention_global": "kpis/kpi_retention_global.parquet",
+    "retention_summary": "kpis/kpi_retention_summary.parquet",
+    "produits": "kpis/kpi_produits.parquet",
+    "top_produits_ca": "kpis/kpi_top_produits_ca.parquet",
+}
+
+
+FACT_PATHS: Dict[str, str] = {
+    "ca_jour": "facts/fact_ca_jour.parquet",
+    "ca_semaine": "facts/fact_ca_semaine.parquet",
+    "ca_mois": "facts/fact_ca_mois.parquet",
+    "ca_heure": "facts/fact_ca_heure.parquet",
+    "ca_pays": "facts/fact_ca_pays.parquet",
+}
+
+
+ANALYTICS_PATHS: Dict[str, str] = {
+    "saisonnalite_jour": "analytics/analytics_saisonnalite_jour.parquet",
+    "saisonnalite_heure": "analytics/analytics_saisonnalite_heure.parquet",
+    "saisonnalite_mois": "analytics/analytics_saisonnalite_mois.parquet",
+    "concentration_summary": "analytics/analytics_concentration_summary.parquet",
+    "cohortes_total": "analytics/analytics_cohortes_total.parquet",
+}
+
+
+def _gold_loader(key: str) -> Callable[[str], pd.DataFrame]:
+    """Choisit le cache (et donc la TTL) adapté à la table `key`."""
+    if key in FAST_TABLES:
+        return _load_parquet_fast
+    if key in STABLE_TABLES:
+        return _load_parquet_stable
+    return load_parquet_from_gold
+
+
+def _load_parallel(
+    sources: Dict[str, str],
+    read: Optional[Callable[[str], pd.DataFrame]] = None,
+) -> dict:
+    """Charge chaque table en parallèle (I/O) et réassocie les résultats aux clés.
+
+    Par défaut, fichiers Gold via le cache de la TTL de chaque table ; `read` force un
+    autre lecteur (ex: endpoints API sans cache pour le benchmark).
+    """
+    with _executor(MAX_WORKERS) as executor:
+        futures = {key: executor.submit(read or _gold_loader(key), path) for key, path in sources.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+
 def load_all_kpis() -> dict:
     """Charge tous les KPIs depuis Gold (MinIO direct)."""
-    return {
-        "globaux": load_parquet_from_gold("kpis/kpi_globaux.parquet"),
-        "croissance": load_parquet_from_gold("kpis/kpi_croissance_mensuelle.parquet"),
-        "rfm": load_parquet_from_gold("kpis/kpi_rfm.parquet"),
-        "clv_detail": load_parquet_from_gold("kpis/kpi_clv_detail.parquet"),
-        "clv_pays": load_parquet_from_gold("kpis/kpi_clv_pays.parquet"),
-        "retention_global": load_parquet_from_gold("kpis/kpi_retention_global.parquet"),
-        "retention_summary": load_parquet_from_gold("kpis/kpi_retention_summary.parquet"),
-        "produits": load_parquet_from_gold("kpis/kpi_produits.parquet"),
-        "top_produits_ca": load_parquet_from_gold("kpis/kpi_top_produits_ca.parquet"),
-    }
+    return _load_parallel(KPI_PATHS)
 
 
 def load_all_facts() -> dict:
     """Charge toutes les tables de faits depuis Gold (MinIO direct)."""
-    return {
-        "ca_jour": load_parquet_from_gold("facts/fact_ca_jour.parquet"),
-        "ca_semaine": load_parquet_from_gold("facts/fact_ca_semaine.parquet"),
-        "ca_mois": load_parquet_from_gold("facts/fact_ca_mois.parquet"),
-        "ca_heure": load_parquet_from_gold("facts/fact_ca_heure.parquet"),
-        "ca_pays": load_parquet_from_gold("facts/fact_ca_pays.parquet"),
-    }
+    return _load_parallel(FACT_PATHS)
 
 
 def load_all_analytics() -> dict:
     """Charge toutes les analyses depuis Gold (MinIO direct)."""
-    return {
-        "saisonnalite_jour": load_parquet_from_gold(
-            "analytics/analytics_saisonnalite_jour.parquet"
-        ),
-        "saisonnalite_heure": load_parquet_from_gold(
-            "analytics/analytics_saisonnalite_heure.parquet"
-        ),
-        "saisonnalite_mois": load_parquet_from_gold(
-            "analytics/analytics_saisonnalite_mois.parquet"
-        ),
-        "concentration_summary": load_parquet_from_gold(
-            "analytics/analytics_concentration_summary.parquet"
-        ),
-        "cohortes_total": load_parquet_from_gold(
-            "analytics/analytics_cohortes_total.parquet"
-        ),
-    }
+    return _load_parallel(ANALYTICS_PATHS)
 
 
 # === Chargement via l'API MongoDB ===
@@ -119,67 +196,169 @@ ANALYTICS_KEYS: Dict[str, str] = {
 }
 
 
-def _load_df_from_api(endpoint: str) -> pd.DataFrame:
+def _fetch_df_from_api(endpoint: str) -> pd.DataFrame:
+    """Charge un endpoint unitaire de l'API en DataFrame (sans cache)."""
     url = f"{API_BASE_URL}{endpoint}"
     try:
-        resp = requests.get(url, timeout=10)
+        resp = _SESSION.get(url, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-        if not data:
+        if not resp.content:
             return pd.DataFrame()
-        return pd.DataFrame(data)
+        # /facts et /analytics répondent en NDJSON (un document par ligne)
+        lines = resp.headers.get("content-type", "").startswith("application/x-ndjson")
+        # Parsing C direct des octets JSON vers des colonnes typées Arrow (sans liste de dicts)
+        return pd.read_json(
+            BytesIO(resp.content),
+            orient="records",
+            lines=lines,
+            dtype_backend="pyarrow",
+        )
     except Exception as e:
         print(f"Erreur lors de l'appel API {url}: {e}")
         return pd.DataFrame()
 
 
-def load_all_kpis_api() -> dict:
-    """Charge tous les KPIs via l'API MongoDB."""
-    return {
-        key: _load_df_from_api(f"/kpis/{api_name}")
-        for key, api_name in KPI_KEYS.items()
-    }
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _load_df_from_api(endpoint: str) -> pd.DataFrame:
+    return _fetch_df_from_api(endpoint)
 
 
-def load_all_facts_api() -> dict:
-    """Charge toutes les tables de faits via l'API MongoDB."""
-    return {
-        key: _load_df_from_api(f"/facts/{api_name}")
-        for key, api_name in FACT_KEYS.items()
-    }
+@st.cache_data(ttl=FAST_TTL, show_spinner=False)
+def _load_df_fast(endpoint: str) -> pd.DataFrame:
+    return _fetch_df_from_api(endpoint)
 
 
-def load_all_analytics_api() -> dict:
-    """Charge toutes les analyses via l'API MongoDB."""
-    return {
-        key: _load_df_from_api(f"/analytics/{api_name}")
-        for key, api_name in ANALYTICS_KEYS.items()
-    }
+@st.cache_data(ttl=STABLE_TTL, show_spinner=False)
+def _load_df_stable(endpoint: str) -> pd.DataFrame:
+    return _fetch_df_from_api(endpoint)
+
+
+def _api_loader(key: str) -> Callable[[str], pd.DataFrame]:
+    """Choisit le cache (et donc la TTL) adapté à la table `key`."""
+    if key in FAST_TABLES:
+        return _load_df_fast
+    if key in STABLE_TABLES:
+        return _load_df_stable
+    return _load_df_from_api
+
+
+# === Chargement à la demande (une table à la fois) ===
+
+GOLD_PATHS: Dict[str, Dict[str, str]] = {
+    "kpis": KPI_PATHS,
+    "facts": FACT_PATHS,
+    "analytics": ANALYTICS_PATHS,
+}
+
+API_KEYS: Dict[str, Dict[str, str]] = {
+    "kpis": KPI_KEYS,
+    "facts": FACT_KEYS,
+    "analytics": ANALYTICS_KEYS,
+}
+
+
+def load_table(group: str, key: str, from_api: bool = False) -> pd.DataFrame:
+    """Charge une seule table d'un groupe (MinIO direct ou API), via le cache de sa TTL."""
+    if from_api:
+        return _api_loader(key)(f"/{group}/{API_KEYS[group][key]}")
+    return _gold_loader(key)(GOLD_PATHS[group][key])
+
+
+class DataBundle:
+    """
+    Tables d'un groupe (kpis, facts, analytics) chargées à la demande.
+
+    `bundle['rfm']` ne charge que la table rfm ; `prefetch` charge en
+    parallèle les tables d'une page qui en affiche plusieurs.
+    """
+
+    def __init__(self, group: str, loader: Callable[[str, str], pd.DataFrame]):
+        self.group = group
+        self._loader = loader
+        self._tables: Dict[str, pd.DataFrame] = {}
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in self._tables:
+            self._tables[key] = self._loader(self.group, key)
+        return self._tables[key]
+
+    def prefetch(self, keys: List[str]) -> None:
+        missing = [key for key in keys if key not in self._tables]
+        if not missing:
+            return
+        with _executor(MAX_WORKERS) as executor:
+            tables = executor.map(lambda key: self._loader(self.group, key), missing)
+            self._tables.update(zip(missing, tables))
+
+
+# === Version des données Gold -> Mongo (invalidation des caches API) ===
+
+@st.cache_data(ttl=REFRESH_PROBE_TTL, show_spinner=False)
+def get_last_refresh() -> Optional[str]:
+    """Retourne `refreshed_at` du dernier refresh Gold -> Mongo (None si l'API ne répond pas)."""
+    url = f"{API_BASE_URL}/meta/last-refresh"
+    try:
+        resp = _SESSION.get(url, timeout=2)
+        resp.raise_for_status()
+        return str(resp.json()["refreshed_at"])
+    except Exception as e:
+        print(f"⚠️  Date du dernier refresh indisponible ({url}): {e}")
+        return None
+
+
+def clear_api_caches() -> None:
+    """Vide les caches de l'API (à appeler quand Mongo a été resynchronisé)."""
+    _load_df_from_api.clear()
+    _load_df_fast.clear()
+    _load_df_stable.clear()
+
+
+def clear_loader_caches() -> None:
+    """Vide les caches par fichier / par groupe (MinIO et API)."""
+    load_parquet_from_gold.clear()
+    _load_parquet_fast.clear()
+    _load_parquet_stable.clear()
+    clear_api_caches()
 
 
 # === Benchmark des deux sources pour le dashboard ===
 
-def benchmark_sources() -> Dict[str, float]:
+def _timed_parallel(loaders: List[Callable[[], dict]]) -> float:
+    """Lance les chargeurs de groupes en parallèle et retourne la durée (s)."""
+    t0 = time.perf_counter_ns()
+    with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+        futures = [executor.submit(loader) for loader in loaders]
+        for future in futures:
+            future.result()
+    return (time.perf_counter_ns() - t0) / 1e9
+
+
+def benchmark_sources(trials: int = BENCHMARK_TRIALS) -> Dict[str, float]:
     """
     Compare les temps de chargement entre MinIO direct et API Mongo.
 
+    Chaque essai charge toutes les tables kpis+facts+analytics une par une, en parallèle,
+    comme le dashboard (fichiers Gold / endpoints unitaires de l'API), avec les lecteurs
+    sans cache: les caches des sessions ne sont pas vidés.
     Retourne un dict avec:
-        - minio_total: temps (s) pour charger kpis+facts+analytics depuis MinIO
-        - api_total  : temps (s) pour charger kpis+facts+analytics via l'API
+        - minio_total / api_total: temps médian (p50, en s) sur `trials` essais
+        - minio_p95 / api_p95    : 95e centile (s)
     """
-    results: Dict[str, float] = {}
-
-    t0 = time.perf_counter()
-    _ = load_all_kpis()
-    _ = load_all_facts()
-    _ = load_all_analytics()
-    results["minio_total"] = time.perf_counter() - t0
+    samples: Dict[str, List[float]] = {"minio": [], "api": []}
+    minio_loaders = [partial(_load_parallel, paths, _read_parquet_from_gold) for paths in GOLD_PATHS.values()]
+    api_loaders = [
+        partial(_load_parallel, {key: f"/{group}/{name}" for key, name in keys.items()}, _fetch_df_from_api)
+        for group, keys in API_KEYS.items()
+    ]
 
-    t0 = time.perf_counter()
-    _ = load_all_kpis_api()
-    _ = load_all_facts_api()
-    _ = load_all_analytics_api()
-    results["api_total"] = time.perf_counter() - t0
+    for _ in range(trials):
+        samples["minio"].append(_timed_parallel(minio_loaders))
+        samples["api"].append(_timed_parallel(api_loaders))
 
+    results: Dict[str, float] = {}
+    for source, times in samples.items():
+        results[f"{source}_total"] = statistics.median(times)
+        results[f"{source}_p95"] = (
+            statistics.quantiles(times, n=20, method="inclusive")[-1] if len(times) > 1 else times[0]
+        )
     return results
-
@@ -2,6 +2,7 @@
 
 from .dimensions import create_dim_clients, create_dim_produits, create_dim_temps
 from .fact_tables import create_fact_achats
+from .client_aggregations import aggregate_by_client, days_since
 from .time_aggregations import (
     aggregate_by_day,
     aggregate_by_week,
@@ -24,6 +25,8 @@ __all__ = [
     "create_dim_produits",
     "create_dim_temps",
     "create_fact_achats",
+    "aggregate_by_client",
+    "days_since",
     "aggregate_by_day",
     "aggregate_by_week",
     "aggregate_by_month",
@@ -0,0 +1,236 @@
+"""
+Noyaux numba pour les agrégations groupby de la couche Gold.
+
+Signatures explicites + cache=True: compilés une fois et rechargés depuis le cache
+aux runs suivants; nogil=True pour tourner en parallèle dans le pool de threads Gold.
+Pas de fastmath (NaN et sommation de Kahan sur les noyaux flottants).
+"""
+
+import numpy as np
+import pandas as pd
+from numba import njit, prange
+from typing import Dict, List, Tuple
+
+
+@njit('int64[:](int32[:], int32[:], int64)', parallel=True, cache=True, nogil=True)
+def _nunique_by_group(group_codes, value_codes, ngroups):
+    """
+    Nombre de codes valeur distincts par code groupe.
+    
+    Répartition des valeurs par groupe (tri par comptage, O(n)), puis chaque
+    groupe est trié et ses transitions comptées en parallèle. Les codes
+    valeur -1 (NaN) ne sont pas comptés, comme `nunique`.
+    """
+    n = group_codes.size
+    bounds = np.zeros(ngroups + 1, np.int64)
+    for i in range(n):
+        bounds[group_codes[i] + 1] += 1
+    for g in range(ngroups):
+        bounds[g + 1] += bounds[g]
+    
+    pos = bounds[:-1].copy()
+    grouped = np.empty(n, np.int32)
+    for i in range(n):
+        g = group_codes[i]
+        grouped[pos[g]] = value_codes[i]
+        pos[g] += 1
+    
+    out = np.zeros(ngroups, np.int64)
+    for g in prange(ngroups):
+        values = np.sort(grouped[bounds[g]:bounds[g + 1]])
+        count = 0
+        prev = -1
+        for v in values:
+            if v != -1 and v != prev:
+                count += 1
+            prev = v
+        out[g] = count
+    return out
+
+
+@njit('int64(float64[:], float64, float64)', cache=True, nogil=True)
+def count_outside(values, lower, upper):
+    """Nombre de valeurs strictement hors de [lower, upper], en une passe sans masque intermédiaire"""
+    count = 0
+    for v in values:
+        count += (v < lower) | (v > upper)
+    return count
+
+
+@njit(
+    'Tuple((float64[:], int64[:], float64[:], float64[:], int64[:], int64[:]))(int32[:], float64[:], int64[:], int64)',
+    cache=True,
+    nogil=True
+)
+def _group_stats(group_codes, values, dates_ns, ngroups):
+    """
+    Somme (compensée, comme pandas), nombre, min et max de `values` et bornes de
+    `dates_ns` par groupe, en un seul passage. NaN et NaT sont ignorés.
+    """
+    nat = np.iinfo(np.int64).min
+    sums = np.zeros(ngroups)
+    compensation = np.zeros(ngroups)
+    counts = np.zeros(ngroups, np.int64)
+    mins = np.full(ngroups, np.inf)
+    maxs = np.full(ngroups, -np.inf)
+    date_min = np.full(ngroups, np.iinfo(np.int64).max)
+    date_max = np.full(ngroups, nat)
+    for i in range(group_codes.size):
+        g = group_codes[i]
+        if g < 0:
+            continue
+        d = dates_ns[i]
+        if d != nat:
+            if d < date_min[g]:
+                date_min[g] = d
+            if d > date_max[g]:
+                date_max[g] = d
+        v = values[i]
+        if np.isnan(v):
+            continue
+        # Sommation de Kahan
+        y = v - compensation[g]
+        t = sums[g] + y
+        compensation[g] = (t - sums[g]) - y
+        sums[g] = t
+        counts[g] += 1
+        if v < mins[g]:
+            mins[g] = v
+        if v > maxs[g]:
+            maxs[g] = v
+    for g in range(ngroups):
+        if counts[g] == 0:
+            mins[g] = np.nan
+            maxs[g] = np.nan
+        if date_max[g] == nat:
+            date_min[g] = nat
+    return sums, counts, mins, maxs, date_min, date_max
+
+
+@njit('UniTuple(float64, 7)(float64[:])', cache=True, nogil=True)
+def _moments(values):
+    """
+    count, mean, std, min, max, skew, kurtosis (formules de pandas) en deux passages
+    natifs: moyenne/min/max puis moments centrés d'ordre 2 à 4. NaN ignorés.
+    """
+    n = 0
+    total = 0.0
+    vmin = np.inf
+    vmax = -np.inf
+    for v in values:
+        if np.isnan(v):
+            continue
+        n += 1
+        total += v
+        if v < vmin:
+            vmin = v
+        if v > vmax:
+            vmax = v
+    if n == 0:
+        return 0.0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+    mean = total / n
+    
+    m2 = 0.0
+    m3 = 0.0
+    m4 = 0.0
+    for v in values:
+        if np.isnan(v):
+            continue
+        d = v - mean
+        d2 = d * d
+        m2 += d2
+        m3 += d2 * d
+        m4 += d2 * d2
+    
+    std = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+    
+    # Skewness (biais corrigé, comme pandas.Series.skew)
+    if n < 3:
+        skew = np.nan
+    elif m2 == 0.0:
+        skew = 0.0
+    else:
+        skew = (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+    
+    # Kurtosis d'excès (biais corrigé, comme pandas.Series.kurtosis)
+    if n < 4:
+        kurt = np.nan
+    else:
+        denominator = (n - 2) * (n - 3) * m2 ** 2
+        if denominator == 0.0:
+            kurt = 0.0
+        else:
+            adj = 3.0 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+            kurt = n * (n + 1) * (n - 1) * m4 / denominator - adj
+    return float(n), mean, std, vmin, vmax, skew, kurt
+
+
+def describe_moments(values: pd.Series) -> Dict[str, float]:
+    """Statistiques descriptives (count, mean, std, min, max, skew, kurtosis) d'une série numérique"""
+    stats = _moments(np.ascontiguousarray(values.to_numpy(dtype=np.float64)))
+    return dict(zip(['count', 'mean', 'std', 'min', 'max', 'skew', 'kurtosis'], stats))
+
+
+def factorize_groups(keys: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Codes int32 des groupes (ordre trié comme groupby, -1 pour les clés manquantes)"""
+    group_codes, uniques = pd.factorize(keys, sort=True)
+    return group_codes.astype(np.int32), pd.Index(uniques)
+
+
+def nunique_by_codes(group_codes: np.ndarray, ngroups: int, values: pd.Series) -> np.ndarray:
+    """Nombre de valeurs distinctes de `values` par groupe (codes de factorize_groups)"""
+    valid = group_codes != -1
+    value_codes = pd.factorize(values)[0][valid].astype(np.int32)
+    return _nunique_by_group(group_codes[valid], value_codes, ngroups)
+
+
+def group_stats(group_codes: np.ndarray, ngroups: int, values: pd.Series, dates: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    Statistiques par groupe de `values` (sum, count, mean, min, max) et bornes de `dates`.
+    
+    Args:
+        group_codes: Codes des groupes (factorize_groups)
+        ngroups: Nombre de groupes
+        values: Valeurs numériques (montant)
+        dates: Dates datetime64
+    
+    Returns:
+        Dict statistique -> tableau par groupe
+    """
+    sums, counts, mins, maxs, date_min, date_max = _group_stats(
+        group_codes,
+        np.ascontiguousarray(values.to_numpy(dtype=np.float64)),
+        dates.to_numpy(dtype='datetime64[ns]').view('i8'),
+        ngroups
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return {
+        'sum': sums,
+        'count': counts,
+        'mean': means,
+        'min': mins,
+        'max': maxs,
+        'date_min': date_min.view('datetime64[ns]'),
+        'date_max': date_max.view('datetime64[ns]'),
+        'size': np.bincount(group_codes[group_codes != -1], minlength=ngroups),
+    }
+
+
+def groupby_nunique(df: pd.DataFrame, key: str, columns: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Équivalent de `df.groupby(key)[col].nunique()` pour plusieurs colonnes.
+    
+    Les groupes sont dans l'ordre trié de `key` (comme groupby avec sort=True),
+    les clés manquantes sont ignorées.
+    
+    Args:
+        df: DataFrame source
+        key: Colonne de regroupement
+        columns: Colonnes dont on compte les valeurs distinctes
+    
+    Returns:
+        Dict colonne -> tableau des nunique par groupe
+    """
+    group_codes, uniques = factorize_groups(df[key])
+    return {col: nunique_by_codes(group_codes, len(uniques), df[col]) for col in columns}
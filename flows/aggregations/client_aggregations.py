@@ -0,0 +1,49 @@
+"""Agrégations par client partagées par les métriques Gold"""
+
+import numpy as np
+import pandas as pd
+
+NS_PAR_JOUR = np.int64(86_400_000_000_000)
+
+
+def aggregate_by_client(fact_achats: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrège la table de faits par client en un seul passage groupby.
+    
+    Réutilisé par la CLV, la rétention, le RFM, les produits, la concentration,
+    les distributions et les KPIs au lieu de regrouper la table de faits dans chaque fonction.
+    
+    Args:
+        fact_achats: Table de faits
+    
+    Returns:
+        DataFrame indexé par id_client (trié) avec ca_total, panier_moyen,
+        nb_achats (montants), nb_achats_total (achats), nb_produits_differents,
+        premier_achat, dernier_achat
+    """
+    return fact_achats.groupby('id_client').agg(
+        ca_total=('montant', 'sum'),
+        panier_moyen=('montant', 'mean'),
+        nb_achats=('montant', 'count'),
+        nb_achats_total=('id_achat', 'count'),
+        nb_produits_differents=('produit', 'nunique'),
+        premier_achat=('date_achat', 'min'),
+        dernier_achat=('date_achat', 'max')
+    )
+
+
+def days_since(dates: pd.Series, reference_date: pd.Timestamp) -> pd.Series:
+    """
+    Nombre de jours entiers entre chaque date et `reference_date` (comme `.dt.days`).
+    
+    Calculé directement sur les entiers int64 (nanosecondes) sans tableau timedelta intermédiaire.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    if dates.isna().any():
+        # NaT: garder la sémantique pandas (NaN)
+        return (reference_date - dates).dt.days
+    
+    dates_ns = dates.to_numpy(dtype='datetime64[ns]').view('i8')
+    jours = (np.int64(pd.Timestamp(reference_date).value) - dates_ns) // NS_PAR_JOUR
+    return pd.Series(jours, index=dates.index)
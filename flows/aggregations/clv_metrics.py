@@ -3,34 +3,37 @@
 import pandas as pd
 import numpy as np
 
+from .client_aggregations import aggregate_by_client
 
-def calculate_clv_metrics(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -> pd.DataFrame:
+
+def calculate_clv_metrics(
+    fact_achats: pd.DataFrame,
+    clients_df: pd.DataFrame,
+    client_aggs: pd.DataFrame = None
+) -> pd.DataFrame:
     """
     Calcule le Customer Lifetime Value pour chaque client.
     
     Args:
         fact_achats: Table de faits
         clients_df: DataFrame clients
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         DataFrame avec métriques CLV
     """
     # Métriques par client
-    clv = fact_achats.groupby('id_client').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'date_achat': ['min', 'max'],
-        'produit': 'nunique'
-    }).reset_index()
+    if client_aggs is None:
+        client_aggs = aggregate_by_client(fact_achats)
     
-    clv.columns = [
-        'id_client',
-        'clv_total',
+    clv = client_aggs[[
+        'ca_total',
         'panier_moyen',
         'nb_achats',
         'premier_achat',
         'dernier_achat',
         'nb_produits_differents'
-    ]
+    ]].rename(columns={'ca_total': 'clv_total'}).reset_index()
     
     # Calculer durée de vie client (en jours)
     clv['premier_achat'] = pd.to_datetime(clv['premier_achat'])
@@ -38,14 +41,13 @@ def calculate_clv_metrics(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -
     clv['duree_vie_jours'] = (clv['dernier_achat'] - clv['premier_achat']).dt.days
     clv['duree_vie_jours'] = clv['duree_vie_jours'].fillna(0)
     
-    # Fréquence d'achat (achats par mois)
-    clv['frequence_mensuelle'] = clv.apply(
-        lambda row: row['nb_achats'] / max(row['duree_vie_jours'] / 30, 1),
-        axis=1
-    )
+    # Fréquence d'achat (achats par mois), durée plancher d'un mois - vectorisé
+    duree = clv['duree_vie_jours'].to_numpy(dtype='float64')
+    nb_achats = clv['nb_achats'].to_numpy(dtype='float64')
+    clv['frequence_mensuelle'] = nb_achats / np.maximum(duree / 30.0, 1.0)
     
     # CLV prédictif (projection sur 12 mois)
-    clv['clv_predictif_12m'] = clv['frequence_mensuelle'] * clv['panier_moyen'] * 12
+    clv['clv_predictif_12m'] = clv['frequence_mensuelle'].to_numpy() * clv['panier_moyen'].to_numpy() * 12
     
     # Joindre avec informations clients
     clv = clv.merge(
@@ -55,7 +57,7 @@ def calculate_clv_metrics(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -
     )
     
     # CLV moyen par pays
-    clv_by_country = clv.groupby('pays').agg({
+    clv_by_country = clv.groupby('pays', observed=True).agg({
         'clv_total': ['mean', 'sum', 'count'],
         'clv_predictif_12m': 'mean',
         'nb_achats': 'mean',
@@ -3,6 +3,11 @@
 import pandas as pd
 
 
+def _month_start(mois: pd.Series) -> pd.Series:
+    """Convertit un mois encodé en entier (année * 12 + mois - 1) en date du 1er du mois"""
+    return pd.to_datetime(pd.DataFrame({'year': mois // 12, 'month': mois % 12 + 1, 'day': 1}))
+
+
 def calculate_cohort_analysis(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -> dict:
     """
     Calcule l'analyse par cohortes d'inscription.
@@ -14,24 +19,31 @@ def calculate_cohort_analysis(fact_achats: pd.DataFrame, clients_df: pd.DataFram
     Returns:
         Dict avec analyses par cohortes
     """
+    # Seules les colonnes utiles à l'analyse sont reprises (pas de copie de toute la table de faits)
+    colonnes = ['id_client', 'id_achat', 'montant', 'date_achat']
+    
     # Vérifier si date_inscription existe déjà dans fact_achats
     if 'date_inscription' not in fact_achats.columns:
         # Joindre pour avoir date d'inscription si elle n'existe pas
-        fact_with_cohort = fact_achats.merge(
+        fact_with_cohort = fact_achats[colonnes].merge(
             clients_df[['id_client', 'date_inscription']],
             on='id_client',
             how='left'
         )
     else:
-        fact_with_cohort = fact_achats.copy()
+        fact_with_cohort = fact_achats[colonnes + ['date_inscription']].copy()
     
     fact_with_cohort['date_inscription'] = pd.to_datetime(fact_with_cohort['date_inscription'], errors='coerce')
     
     # Filtrer les lignes sans date_inscription valide
     fact_with_cohort = fact_with_cohort.dropna(subset=['date_inscription'])
     
-    fact_with_cohort['cohorte_mois'] = fact_with_cohort['date_inscription'].dt.to_period('M').astype(str)
-    fact_with_cohort['mois_achat'] = pd.to_datetime(fact_with_cohort['date_achat']).dt.to_period('M').astype(str)
+    # Mois en entiers (année * 12 + mois - 1): les groupby restent sur des clés int,
+    # la conversion en "YYYY-MM" ne se fait que sur les tables agrégées
+    date_inscription = fact_with_cohort['date_inscription']
+    date_achat = pd.to_datetime(fact_with_cohort['date_achat'])
+    fact_with_cohort['cohorte_mois'] = date_inscription.dt.year * 12 + date_inscription.dt.month - 1
+    fact_with_cohort['mois_achat'] = date_achat.dt.year * 12 + date_achat.dt.month - 1
     
     # CA par cohorte et mois
     cohort_ca = fact_with_cohort.groupby(['cohorte_mois', 'mois_achat']).agg({
@@ -43,12 +55,11 @@ def calculate_cohort_analysis(fact_achats: pd.DataFrame, clients_df: pd.DataFram
     cohort_ca.columns = ['cohorte_mois', 'mois_achat', 'ca_total', 'nb_clients', 'nb_achats']
     
     # Calculer l'âge de la cohorte (mois depuis inscription)
-    cohort_ca['cohorte_date'] = pd.to_datetime(cohort_ca['cohorte_mois'])
-    cohort_ca['achat_date'] = pd.to_datetime(cohort_ca['mois_achat'])
-    cohort_ca['age_cohorte_mois'] = (
-        (cohort_ca['achat_date'].dt.year - cohort_ca['cohorte_date'].dt.year) * 12 +
-        (cohort_ca['achat_date'].dt.month - cohort_ca['cohorte_date'].dt.month)
-    ).fillna(0).astype(int)
+    cohort_ca['cohorte_date'] = _month_start(cohort_ca['cohorte_mois'])
+    cohort_ca['achat_date'] = _month_start(cohort_ca['mois_achat'])
+    cohort_ca['age_cohorte_mois'] = (cohort_ca['mois_achat'] - cohort_ca['cohorte_mois']).astype(int)
+    cohort_ca['cohorte_mois'] = cohort_ca['cohorte_date'].dt.strftime('%Y-%m')
+    cohort_ca['mois_achat'] = cohort_ca['achat_date'].dt.strftime('%Y-%m')
     
     # CA total par cohorte
     cohort_total = fact_with_cohort.groupby('cohorte_mois').agg({
@@ -58,16 +69,17 @@ def calculate_cohort_analysis(fact_achats: pd.DataFrame, clients_df: pd.DataFram
     }).reset_index()
     
     cohort_total.columns = ['cohorte_mois', 'ca_total', 'nb_clients', 'nb_achats']
+    cohort_total['cohorte_mois'] = _month_start(cohort_total['cohorte_mois']).dt.strftime('%Y-%m')
     cohort_total['ca_par_client'] = cohort_total['ca_total'] / cohort_total['nb_clients']
     cohort_total['nb_achats_par_client'] = cohort_total['nb_achats'] / cohort_total['nb_clients']
     
-    # Rétention par cohorte (clients actifs chaque mois)
-    cohort_retention = fact_with_cohort.groupby(['cohorte_mois', 'mois_achat'])['id_client'].nunique().reset_index()
-    cohort_retention.columns = ['cohorte_mois', 'mois_achat', 'nb_clients_actifs']
+    # Rétention par cohorte (clients actifs chaque mois): déjà calculé dans cohort_ca
+    cohort_retention = cohort_ca[['cohorte_mois', 'mois_achat', 'nb_clients']].rename(
+        columns={'nb_clients': 'nb_clients_actifs'}
+    )
     
-    # Nombre total de clients par cohorte
-    cohort_size = fact_with_cohort.groupby('cohorte_mois')['id_client'].nunique().reset_index()
-    cohort_size.columns = ['cohorte_mois', 'taille_cohorte']
+    # Nombre total de clients par cohorte: déjà calculé dans cohort_total
+    cohort_size = cohort_total[['cohorte_mois', 'nb_clients']].rename(columns={'nb_clients': 'taille_cohorte'})
     
     cohort_retention = cohort_retention.merge(cohort_size, on='cohorte_mois')
     cohort_retention['taux_retention'] = (
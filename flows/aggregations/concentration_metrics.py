@@ -2,68 +2,117 @@
 
 import pandas as pd
 import numpy as np
+from numba import njit
 
+from .client_aggregations import aggregate_by_client
 
-def calculate_concentration_metrics(fact_achats: pd.DataFrame) -> dict:
+
+@njit('Tuple((float64[:], float64, int64, float64, float64))(float64[::1])', cache=True, nogil=True)
+def _concentration_kernel(desc_sorted):
+    """
+    Parcours unique du CA trié par ordre décroissant (compilé avec numba).
+    
+    Returns:
+        (cumul, gini, nb_pareto_80, top_10, top_20): CA cumulé, indice de Gini,
+        nombre de lignes sous 80 % du CA cumulé, CA des 10 % et 20 % premiers
+    """
+    n = desc_sorted.size
+    total = 0.0
+    for i in range(n):
+        total += desc_sorted[i]
+    
+    cumul = np.empty(n)
+    running = 0.0
+    weighted_sum = 0.0
+    nb_pareto_80 = 0
+    top_10 = 0.0
+    top_20 = 0.0
+    seuil_10 = int(n * 0.1)
+    seuil_20 = int(n * 0.2)
+    for i in range(n):
+        v = desc_sorted[i]
+        running += v
+        cumul[i] = running
+        # Rang croissant (Gini) = n - i pour un tableau décroissant
+        weighted_sum += (n - i) * v
+        if i < seuil_10:
+            top_10 += v
+        if i < seuil_20:
+            top_20 += v
+        if total > 0.0 and running / total * 100.0 <= 80.0:
+            nb_pareto_80 += 1
+    
+    if n == 0 or total == 0.0:
+        gini = np.nan
+    else:
+        gini = (2.0 * weighted_sum) / (n * total) - (n + 1) / n
+    return cumul, gini, nb_pareto_80, top_10, top_20
+
+
+def calculate_gini(values) -> float:
+    """Calcule l'indice de Gini"""
+    desc_sorted = np.sort(np.asarray(values, dtype=np.float64))[::-1]
+    return _concentration_kernel(np.ascontiguousarray(desc_sorted))[1]
+
+
+def _concentration_table(ca: pd.Series, key: str, total_ca: float):
+    """Table de concentration (CA cumulé) d'une série de CA déjà triée par ordre décroissant."""
+    cumul, gini, nb_pareto_80, top_10, top_20 = _concentration_kernel(
+        np.ascontiguousarray(ca.to_numpy(dtype=np.float64))
+    )
+    table = ca.reset_index()
+    table.columns = [key, 'ca_total']
+    table['pct_ca'] = (table['ca_total'] / total_ca * 100)
+    table['ca_cumul'] = cumul
+    table['pct_ca_cumul'] = (table['ca_cumul'] / total_ca * 100)
+    return table, gini
+
+
+def calculate_concentration_metrics(fact_achats: pd.DataFrame, client_aggs: pd.DataFrame = None) -> dict:
     """
     Calcule les métriques de concentration (Pareto, Gini).
     
     Args:
         fact_achats: Table de faits
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         Dict avec métriques de concentration
     """
     # Concentration par client (Pareto)
-    client_ca = fact_achats.groupby('id_client')['montant'].sum().sort_values(ascending=False).reset_index()
+    if client_aggs is None:
+        client_aggs = aggregate_by_client(fact_achats)
+    
+    client_ca = client_aggs['ca_total'].sort_values(ascending=False)
+    cumul, gini_clients, nb_pareto_80, ca_top_10, ca_top_20 = _concentration_kernel(
+        np.ascontiguousarray(client_ca.to_numpy(dtype=np.float64))
+    )
+    client_ca = client_ca.reset_index()
     client_ca.columns = ['id_client', 'ca_total']
     
     total_ca = client_ca['ca_total'].sum()
-    client_ca['ca_cumul'] = client_ca['ca_total'].cumsum()
+    client_ca['ca_cumul'] = cumul
     client_ca['pct_ca_cumul'] = (client_ca['ca_cumul'] / total_ca * 100)
     client_ca['pct_clients_cumul'] = (np.arange(1, len(client_ca) + 1) / len(client_ca) * 100)
     
     # Règle de Pareto (80/20)
-    pareto_80 = client_ca[client_ca['pct_ca_cumul'] <= 80]
-    pareto_20_pct = len(pareto_80) / len(client_ca) * 100 if len(client_ca) > 0 else 0
-    
-    # Top 10% et Top 20%
-    top_10_pct = int(len(client_ca) * 0.1)
-    top_20_pct = int(len(client_ca) * 0.2)
-    
-    ca_top_10 = client_ca.head(top_10_pct)['ca_total'].sum() if top_10_pct > 0 else 0
-    ca_top_20 = client_ca.head(top_20_pct)['ca_total'].sum() if top_20_pct > 0 else 0
+    pareto_20_pct = nb_pareto_80 / len(client_ca) * 100 if len(client_ca) > 0 else 0
     
+    # Top 10% et Top 20% (sommés dans le même parcours que le cumul)
     pct_ca_top_10 = (ca_top_10 / total_ca * 100) if total_ca > 0 else 0
     pct_ca_top_20 = (ca_top_20 / total_ca * 100) if total_ca > 0 else 0
     
-    # Indice de Gini pour concentration
-    def calculate_gini(values):
-        """Calcule l'indice de Gini"""
-        sorted_values = np.sort(values)
-        n = len(sorted_values)
-        index = np.arange(1, n + 1)
-        return (2 * np.sum(index * sorted_values)) / (n * np.sum(sorted_values)) - (n + 1) / n
-    
-    gini_clients = calculate_gini(client_ca['ca_total'].values)
-    
     # Concentration par pays
-    country_ca = fact_achats.groupby('pays')['montant'].sum().sort_values(ascending=False).reset_index()
-    country_ca.columns = ['pays', 'ca_total']
-    country_ca['pct_ca'] = (country_ca['ca_total'] / total_ca * 100)
-    country_ca['ca_cumul'] = country_ca['ca_total'].cumsum()
-    country_ca['pct_ca_cumul'] = (country_ca['ca_cumul'] / total_ca * 100)
-    
-    gini_pays = calculate_gini(country_ca['ca_total'].values)
+    country_ca, gini_pays = _concentration_table(
+        fact_achats.groupby('pays', sort=False, observed=True)['montant'].sum().sort_values(ascending=False),
+        'pays', total_ca
+    )
     
     # Concentration par produit
-    product_ca = fact_achats.groupby('produit')['montant'].sum().sort_values(ascending=False).reset_index()
-    product_ca.columns = ['produit', 'ca_total']
-    product_ca['pct_ca'] = (product_ca['ca_total'] / total_ca * 100)
-    product_ca['ca_cumul'] = product_ca['ca_total'].cumsum()
-    product_ca['pct_ca_cumul'] = (product_ca['ca_cumul'] / total_ca * 100)
-    
-    gini_produits = calculate_gini(product_ca['ca_total'].values)
+    product_ca, gini_produits = _concentration_table(
+        fact_achats.groupby('produit', sort=False, observed=True)['montant'].sum().sort_values(ascending=False),
+        'produit', total_ca
+    )
     
     # Résumé
     concentration_summary = pd.DataFrame([{
@@ -1,7 +1,33 @@
 """Création des tables de dimensions pour la couche Gold"""
 
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Dict, Tuple
+
+NS_PAR_JOUR = 86_400_000_000_000
+JOURS_NOMS = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+MOIS_NOMS = np.array([
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+], dtype=object)
+
+
+def _civil_from_days(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convertit des jours depuis 1970-01-01 en (année, mois, jour) par arithmétique entière.
+    
+    Algorithme "civil_from_days" de Howard Hinnant (calendrier grégorien proleptique).
+    """
+    z = days + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    jour = doy - (153 * mp + 2) // 5 + 1
+    mois = np.where(mp < 10, mp + 3, mp - 9)
+    annee = yoe + era * 400 + (mois <= 2)
+    return annee, mois, jour
 
 
 def create_dim_clients(clients_df: pd.DataFrame) -> pd.DataFrame:
@@ -34,7 +60,7 @@ def create_dim_produits(achats_df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame dimension produits
     """
-    dim_produits = achats_df.groupby('produit').agg({
+    dim_produits = achats_df.groupby('produit', observed=True).agg({
         'montant': ['min', 'max', 'mean', 'sum'],
         'id_achat': 'count'
     }).reset_index()
@@ -71,19 +97,24 @@ def create_dim_temps(start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.Dat
     """
     dates = pd.date_range(start=start_date, end=end_date, freq='D')
     
+    # Année/mois/jour calculés une seule fois depuis la vue int64 (ns) des dates
+    days = dates.asi8 // NS_PAR_JOUR
+    annee, mois, jour = _civil_from_days(days)
+    trimestre = (mois - 1) // 3 + 1
+    jour_semaine_num = (days + 3) % 7  # 1970-01-01 était un jeudi
+    
     dim_temps = pd.DataFrame({
         'date': dates,
-        'jour': dates.day,
-        'mois': dates.month,
-        'annee': dates.year,
-        'trimestre': dates.quarter,
+        'jour': jour.astype(np.int32),
+        'mois': mois.astype(np.int32),
+        'annee': annee.astype(np.int32),
+        'trimestre': trimestre.astype(np.int32),
         'semaine_annee': dates.isocalendar().week,
-        'jour_semaine': dates.day_name(),
-        'jour_semaine_num': dates.dayofweek,
-        'est_weekend': dates.dayofweek.isin([5, 6]),
-        'mois_nom': dates.strftime('%B'),
-        'trimestre_nom': dates.to_period('Q').astype(str),
+        'jour_semaine': JOURS_NOMS[jour_semaine_num],
+        'jour_semaine_num': jour_semaine_num.astype(np.int32),
+        'est_weekend': jour_semaine_num >= 5,
+        'mois_nom': MOIS_NOMS[mois - 1],
+        'trimestre_nom': (pd.Series(annee).astype(str) + 'Q' + pd.Series(trimestre).astype(str)).to_numpy(),
     })
     
     return dim_temps
-
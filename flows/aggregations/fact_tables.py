@@ -1,7 +1,20 @@
 """Création des tables de faits pour la couche Gold"""
 
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import List, Tuple
+
+
+def _catify(df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """
+    Convertit les colonnes texte en `category` (en place).
+    
+    Les groupby sur ces colonnes hachent alors des codes entiers au lieu des chaînes.
+    """
+    for col in cols:
+        if col in df.columns and (df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype)):
+            df[col] = df[col].astype('category')
+    return df
 
 
 def create_fact_achats(achats_df: pd.DataFrame, clients_df: pd.DataFrame) -> pd.DataFrame:
@@ -22,29 +35,35 @@ def create_fact_achats(achats_df: pd.DataFrame, clients_df: pd.DataFrame) -> pd.
         how='left'
     )
     
-    # Enrichir avec informations temporelles
-    fact_achats['date_achat'] = pd.to_datetime(fact_achats['date_achat'])
-    fact_achats['annee'] = fact_achats['date_achat'].dt.year
-    fact_achats['mois'] = fact_achats['date_achat'].dt.month
-    fact_achats['trimestre'] = fact_achats['date_achat'].dt.quarter
-    fact_achats['semaine_annee'] = fact_achats['date_achat'].dt.isocalendar().week
-    fact_achats['jour_semaine'] = fact_achats['date_achat'].dt.day_name()
-    fact_achats['jour_semaine_num'] = fact_achats['date_achat'].dt.dayofweek
-    fact_achats['heure'] = fact_achats['date_achat'].dt.hour
-    fact_achats['est_weekend'] = fact_achats['date_achat'].dt.dayofweek.isin([5, 6])
+    # Montant en float64 contigu dans son propre bloc: toutes les réductions groupby
+    # (sum/mean/min/max) lisent ensuite un seul tableau C-contigu
+    fact_achats['montant'] = np.ascontiguousarray(fact_achats['montant'].to_numpy(dtype=np.float64))
+    
+    # Enrichir avec informations temporelles (date convertie une seule fois)
+    dates = pd.to_datetime(fact_achats['date_achat'])
+    jour_semaine_num = dates.dt.dayofweek
+    fact_achats['date_achat'] = dates
+    fact_achats['annee'] = dates.dt.year
+    fact_achats['mois'] = dates.dt.month
+    fact_achats['trimestre'] = dates.dt.quarter
+    fact_achats['semaine_annee'] = dates.dt.isocalendar().week
+    fact_achats['jour_semaine'] = dates.dt.day_name()
+    fact_achats['jour_semaine_num'] = jour_semaine_num
+    fact_achats['heure'] = dates.dt.hour
+    fact_achats['est_weekend'] = jour_semaine_num >= 5
     
     # Calculer l'ancienneté du client au moment de l'achat
     fact_achats['date_inscription'] = pd.to_datetime(fact_achats['date_inscription'])
-    fact_achats['anciennete_jours'] = (
-        fact_achats['date_achat'] - fact_achats['date_inscription']
-    ).dt.days
+    fact_achats['anciennete_jours'] = (dates - fact_achats['date_inscription']).dt.days
     
     # Ajouter des champs calculés
-    fact_achats['annee_mois'] = fact_achats['date_achat'].dt.to_period('M').astype(str)
+    fact_achats['annee_mois'] = dates.dt.to_period('M').astype(str)
     fact_achats['annee_semaine'] = (
         fact_achats['annee'].astype(str) + '-W' + 
         fact_achats['semaine_annee'].astype(str).str.zfill(2)
     )
     
-    return fact_achats
+    # Clés de regroupement compactes, une fois pour toutes les agrégations:
+    # texte en catégoriel (id_client est déjà en int32 depuis Silver)
+    return _catify(fact_achats, ['pays', 'produit'])
 
@@ -5,7 +5,8 @@ import pandas as pd
 
 def aggregate_by_country(fact_achats: pd.DataFrame) -> pd.DataFrame:
     """Agrège les données par pays"""
-    agg = fact_achats.groupby('pays').agg({
+    # Pas de tri des groupes: le résultat est retrié par CA à la fin
+    agg = fact_achats.groupby('pays', sort=False, observed=True).agg({
         'montant': ['sum', 'mean', 'min', 'max', 'count'],
         'id_client': 'nunique',
         'id_achat': 'count',
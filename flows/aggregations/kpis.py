@@ -3,14 +3,21 @@
 import pandas as pd
 import numpy as np
 
+from .client_aggregations import aggregate_by_client
 
-def calculate_global_kpis(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -> pd.DataFrame:
+
+def calculate_global_kpis(
+    fact_achats: pd.DataFrame,
+    clients_df: pd.DataFrame,
+    client_aggs: pd.DataFrame = None
+) -> pd.DataFrame:
     """
     Calcule les KPIs globaux.
     
     Args:
         fact_achats: Table de faits
         clients_df: DataFrame clients
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         DataFrame avec KPIs globaux
@@ -27,10 +34,15 @@ def calculate_global_kpis(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -
     ca_par_client = total_ca / nb_clients if nb_clients > 0 else 0
     nb_achats_par_client = nb_achats / nb_clients if nb_clients > 0 else 0
     
+    # Dates d'achat converties une seule fois (no-op si déjà datetime64)
+    dates_achat = fact_achats['date_achat']
+    if not pd.api.types.is_datetime64_any_dtype(dates_achat):
+        dates_achat = pd.to_datetime(dates_achat)
+    
     # Période
-    date_min = fact_achats['date_achat'].min()
-    date_max = fact_achats['date_achat'].max()
-    duree_jours = (pd.to_datetime(date_max) - pd.to_datetime(date_min)).days
+    date_min = dates_achat.min()
+    date_max = dates_achat.max()
+    duree_jours = (date_max - date_min).days
     
     # Métriques temporelles
     ca_par_jour = total_ca / duree_jours if duree_jours > 0 else 0
@@ -38,17 +50,20 @@ def calculate_global_kpis(fact_achats: pd.DataFrame, clients_df: pd.DataFrame) -
     
     # Clients actifs
     now = pd.Timestamp.now()
-    clients_actifs_30j = fact_achats[
-        pd.to_datetime(fact_achats['date_achat']) >= (now - pd.Timedelta(days=30))
-    ]['id_client'].nunique()
+    cutoff_30j = now - pd.Timedelta(days=30)
+    cutoff_90j = now - pd.Timedelta(days=90)
     
-    clients_actifs_90j = fact_achats[
-        pd.to_datetime(fact_achats['date_achat']) >= (now - pd.Timedelta(days=90))
-    ]['id_client'].nunique()
+    # Un client est actif si son dernier achat est après la date seuil (une seule réduction)
+    if client_aggs is not None:
+        dernier_achat = pd.to_datetime(client_aggs['dernier_achat'])
+    else:
+        dernier_achat = dates_achat.groupby(fact_achats['id_client'], sort=False).max()
+    clients_actifs_30j = int((dernier_achat >= cutoff_30j).sum())
+    clients_actifs_90j = int((dernier_achat >= cutoff_90j).sum())
     
     # Nouveaux clients
     nouveaux_clients = len(clients_df[
-        pd.to_datetime(clients_df['date_inscription']) >= (now - pd.Timedelta(days=30))
+        pd.to_datetime(clients_df['date_inscription']) >= cutoff_30j
     ])
     
     kpis = pd.DataFrame([{
@@ -83,10 +98,13 @@ def calculate_growth_metrics(fact_achats: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame avec métriques de croissance
     """
-    # Agrégation par mois
-    fact_achats['annee_mois'] = pd.to_datetime(fact_achats['date_achat']).dt.to_period('M').astype(str)
+    # Agrégation par mois (annee_mois est déjà calculé dans la table de faits)
+    if 'annee_mois' in fact_achats.columns:
+        annee_mois = fact_achats['annee_mois']
+    else:
+        annee_mois = pd.to_datetime(fact_achats['date_achat']).dt.to_period('M').astype(str).rename('annee_mois')
     
-    monthly = fact_achats.groupby('annee_mois').agg({
+    monthly = fact_achats.groupby(annee_mois).agg({
         'montant': 'sum',
         'id_client': 'nunique',
         'id_achat': 'count'
@@ -101,30 +119,19 @@ def calculate_growth_metrics(fact_achats: pd.DataFrame) -> pd.DataFrame:
         (monthly['ca_total'] - monthly['ca_prev']) / monthly['ca_prev'] * 100
     ).fillna(0)
     
-    # Croissance YoY (Year over Year)
-    monthly['annee'] = pd.to_datetime(monthly['annee_mois']).dt.year
-    monthly['mois'] = pd.to_datetime(monthly['annee_mois']).dt.month
-    
-    # Créer une copie pour la comparaison YoY
-    monthly_yoy = monthly.copy()
-    monthly_yoy['annee_prev'] = monthly_yoy['annee'] - 1
-    
-    # Joindre avec les données de l'année précédente
-    monthly_prev = monthly[['annee', 'mois', 'ca_total']].copy()
-    monthly_prev.columns = ['annee_prev', 'mois', 'ca_yoy']
-    
-    monthly_yoy = monthly_yoy.merge(
-        monthly_prev,
-        on=['annee_prev', 'mois'],
-        how='left'
-    )
+    # Croissance YoY (Year over Year): même mois de l'année précédente via un décalage
+    # de 12 périodes sur un index mensuel continu (les mois sans achat restent vides)
+    mois = pd.PeriodIndex(monthly['annee_mois'], freq='M')
+    ca_mensuel = pd.Series(monthly['ca_total'].to_numpy(), index=mois)
+    mois_continus = pd.period_range(mois.min(), mois.max(), freq='M')
+    monthly['ca_yoy'] = ca_mensuel.reindex(mois_continus).shift(12).reindex(mois).to_numpy()
     
-    monthly_yoy['taux_croissance_yoy'] = (
-        (monthly_yoy['ca_total'] - monthly_yoy['ca_yoy']) / monthly_yoy['ca_yoy'] * 100
+    monthly['taux_croissance_yoy'] = (
+        (monthly['ca_total'] - monthly['ca_yoy']) / monthly['ca_yoy'] * 100
     ).fillna(0)
     
     # Sélectionner colonnes pertinentes
-    growth_metrics = monthly_yoy[[
+    growth_metrics = monthly[[
         'annee_mois', 'ca_total', 'nb_clients', 'nb_achats',
         'taux_croissance_mom', 'taux_croissance_yoy'
     ]].copy()
@@ -1,20 +1,24 @@
 """Métriques de performance produits pour la couche Gold"""
 
+import numpy as np
 import pandas as pd
 
+from .client_aggregations import aggregate_by_client
 
-def calculate_product_metrics(fact_achats: pd.DataFrame) -> dict:
+
+def calculate_product_metrics(fact_achats: pd.DataFrame, client_aggs: pd.DataFrame = None) -> dict:
     """
     Calcule les métriques de performance par produit.
     
     Args:
         fact_achats: Table de faits
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         Dict avec différentes métriques produits
     """
     # Métriques par produit
-    product_metrics = fact_achats.groupby('produit').agg({
+    product_metrics = fact_achats.groupby('produit', observed=True).agg({
         'montant': ['sum', 'mean', 'min', 'max', 'count'],
         'id_client': 'nunique',
         'id_achat': 'count',
@@ -45,26 +49,23 @@ def calculate_product_metrics(fact_achats: pd.DataFrame) -> dict:
     top_products_ca = product_metrics.nlargest(10, 'ca_total')[['produit', 'ca_total', 'nb_achats_total', 'pct_ca_total']]
     top_products_volume = product_metrics.nlargest(10, 'nb_achats_total')[['produit', 'nb_achats_total', 'ca_total']]
     
-    # Produits complémentaires (achetés ensemble par même client)
-    client_products = fact_achats.groupby('id_client')['produit'].apply(list).reset_index()
-    
     # Analyse de diversité du panier
-    basket_diversity = fact_achats.groupby('id_client').agg({
-        'produit': 'nunique',
-        'id_achat': 'count',
-        'montant': 'sum'
-    }).reset_index()
+    if client_aggs is None:
+        client_aggs = aggregate_by_client(fact_achats)
     
+    basket_diversity = client_aggs[['nb_produits_differents', 'nb_achats_total', 'ca_total']].reset_index()
     basket_diversity.columns = ['id_client', 'nb_produits_differents', 'nb_achats_total', 'ca_total']
     basket_diversity['diversite_moyenne'] = basket_diversity['nb_produits_differents'] / basket_diversity['nb_achats_total']
     
     # Clients mono-produit vs multi-produits
-    basket_diversity['type_client'] = basket_diversity.apply(
-        lambda row: 'Mono-produit' if row['nb_produits_differents'] == 1 else 'Multi-produits',
-        axis=1
+    type_client = np.where(
+        basket_diversity['nb_produits_differents'].to_numpy() == 1,
+        'Mono-produit',
+        'Multi-produits'
     )
+    basket_diversity['type_client'] = pd.Categorical(type_client, categories=['Mono-produit', 'Multi-produits'])
     
-    diversity_summary = basket_diversity.groupby('type_client').agg({
+    diversity_summary = basket_diversity.groupby('type_client', observed=True).agg({
         'id_client': 'count',
         'nb_produits_differents': 'mean',
         'ca_total': 'mean'
@@ -1,10 +1,18 @@
 """Métriques de rétention et churn pour la couche Gold"""
 
+import numpy as np
 import pandas as pd
 from datetime import timedelta
 
+from .client_aggregations import aggregate_by_client, days_since
 
-def calculate_retention_metrics(fact_achats: pd.DataFrame, clients_df: pd.DataFrame, reference_date: pd.Timestamp = None) -> dict:
+
+def calculate_retention_metrics(
+    fact_achats: pd.DataFrame,
+    clients_df: pd.DataFrame,
+    reference_date: pd.Timestamp = None,
+    client_aggs: pd.DataFrame = None
+) -> dict:
     """
     Calcule les métriques de rétention et churn.
     
@@ -12,6 +20,7 @@ def calculate_retention_metrics(fact_achats: pd.DataFrame, clients_df: pd.DataFr
         fact_achats: Table de faits
         clients_df: DataFrame clients
         reference_date: Date de référence
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         Dict avec différentes métriques de rétention
@@ -19,49 +28,48 @@ def calculate_retention_metrics(fact_achats: pd.DataFrame, clients_df: pd.DataFr
     if reference_date is None:
         reference_date = pd.Timestamp.now()
     
-    # Dernier achat par client
-    dernier_achat = fact_achats.groupby('id_client')['date_achat'].max().reset_index()
-    dernier_achat.columns = ['id_client', 'dernier_achat']
-    dernier_achat['dernier_achat'] = pd.to_datetime(dernier_achat['dernier_achat'])
-    dernier_achat['jours_inactivite'] = (reference_date - dernier_achat['dernier_achat']).dt.days
-    
-    # Nombre d'achats par client
-    nb_achats = fact_achats.groupby('id_client')['id_achat'].count().reset_index()
-    nb_achats.columns = ['id_client', 'nb_achats']
+    # Dernier achat et nombre d'achats par client
+    if client_aggs is None:
+        client_aggs = aggregate_by_client(fact_achats)
     
-    # Joindre
-    retention = dernier_achat.merge(nb_achats, on='id_client')
+    retention = client_aggs[['dernier_achat', 'nb_achats_total']].rename(
+        columns={'nb_achats_total': 'nb_achats'}
+    ).reset_index()
+    retention['dernier_achat'] = pd.to_datetime(retention['dernier_achat'])
+    retention.insert(2, 'jours_inactivite', days_since(retention['dernier_achat'], reference_date))
     
-    # Segmentation par statut
-    retention['statut'] = retention.apply(
-        lambda row: 'Actif' if row['jours_inactivite'] <= 30 
-        else 'À risque' if row['jours_inactivite'] <= 90 
-        else 'Inactif' if row['jours_inactivite'] <= 180 
-        else 'Churn',
-        axis=1
+    # Segmentation par statut (seuils de jours d'inactivité, vectorisé)
+    jours = retention['jours_inactivite'].to_numpy()
+    statut = np.select(
+        [jours <= 30, jours <= 90, jours <= 180],
+        ['Actif', 'À risque', 'Inactif'],
+        default='Churn'
     )
+    # Catégoriel (ordre alphabétique, comme le tri du groupby): groupby sur codes int8
+    retention['statut'] = pd.Categorical(statut, categories=sorted(['Actif', 'À risque', 'Inactif', 'Churn']))
     
     # Clients récurrents vs nouveaux
     retention['est_recurrent'] = retention['nb_achats'] > 1
     
     # Métriques globales
     total_clients = len(retention)
-    clients_actifs = len(retention[retention['statut'] == 'Actif'])
+    clients_actifs = np.count_nonzero(statut == 'Actif')
     clients_recurrents = retention['est_recurrent'].sum()
-    clients_churn = len(retention[retention['statut'] == 'Churn'])
+    clients_churn = np.count_nonzero(statut == 'Churn')
     
     taux_retention_30j = (clients_actifs / total_clients * 100) if total_clients > 0 else 0
     taux_recurrence = (clients_recurrents / total_clients * 100) if total_clients > 0 else 0
     taux_churn = (clients_churn / total_clients * 100) if total_clients > 0 else 0
     
-    # Rétention par période
+    # Rétention par période: un tri, puis une recherche dichotomique par seuil
+    jours_tries = np.sort(jours)
     retention_periods = {}
     for days in [30, 60, 90, 180, 365]:
-        clients_retained = len(retention[retention['jours_inactivite'] <= days])
+        clients_retained = int(np.searchsorted(jours_tries, days, side='right'))
         retention_periods[f'retention_{days}j'] = (clients_retained / total_clients * 100) if total_clients > 0 else 0
     
     # Résumé par statut
-    retention_summary = retention.groupby('statut').agg({
+    retention_summary = retention.groupby('statut', observed=True).agg({
         'id_client': 'count',
         'jours_inactivite': 'mean',
         'nb_achats': 'mean'
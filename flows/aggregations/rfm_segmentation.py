@@ -1,16 +1,24 @@
 """Segmentation RFM (Recency, Frequency, Monetary) pour la couche Gold"""
 
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+from .client_aggregations import aggregate_by_client, days_since
 
-def calculate_rfm_segmentation(fact_achats: pd.DataFrame, reference_date: pd.Timestamp = None) -> pd.DataFrame:
+
+def calculate_rfm_segmentation(
+    fact_achats: pd.DataFrame,
+    reference_date: pd.Timestamp = None,
+    client_aggs: pd.DataFrame = None
+) -> pd.DataFrame:
     """
     Calcule la segmentation RFM pour chaque client.
     
     Args:
         fact_achats: Table de faits
         reference_date: Date de référence (par défaut: aujourd'hui)
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         DataFrame avec scores RFM et segments
@@ -18,17 +26,15 @@ def calculate_rfm_segmentation(fact_achats: pd.DataFrame, reference_date: pd.Tim
     if reference_date is None:
         reference_date = pd.Timestamp.now()
     
-    # Calculer métriques RFM par client
-    rfm = fact_achats.groupby('id_client').agg({
-        'date_achat': 'max',  # Dernier achat
-        'id_achat': 'count',  # Fréquence
-        'montant': 'sum'      # Montant total
-    }).reset_index()
+    # Calculer métriques RFM par client (dernier achat, fréquence, montant total)
+    if client_aggs is None:
+        client_aggs = aggregate_by_client(fact_achats)
     
+    rfm = client_aggs[['dernier_achat', 'nb_achats_total', 'ca_total']].reset_index()
     rfm.columns = ['id_client', 'dernier_achat', 'frequency', 'monetary']
     
     # Calculer Recency (jours depuis dernier achat)
-    rfm['recency'] = (reference_date - pd.to_datetime(rfm['dernier_achat'])).dt.days
+    rfm['recency'] = days_since(rfm['dernier_achat'], reference_date)
     
     # Créer des scores de 1 à 5 pour chaque dimension
     # Gérer le cas où il n'y a pas assez de valeurs uniques
@@ -59,28 +65,30 @@ def calculate_rfm_segmentation(fact_achats: pd.DataFrame, reference_date: pd.Tim
         rfm['M_score'].astype(str)
     )
     
-    # Segmentation
-    def assign_segment(row):
-        r, f, m = row['R_score'], row['F_score'], row['M_score']
-        
-        if r >= 4 and f >= 4 and m >= 4:
-            return 'Champions'
-        elif r >= 3 and f >= 3 and m >= 3:
-            return 'Loyal'
-        elif r >= 3 and f <= 2 and m >= 3:
-            return 'Potential Loyalist'
-        elif r >= 4 and f <= 2 and m <= 2:
-            return 'New Customers'
-        elif r <= 2 and f >= 3 and m >= 3:
-            return 'At Risk'
-        elif r <= 2 and f <= 2 and m <= 2:
-            return 'Lost'
-        elif r <= 2 and f >= 3 and m <= 2:
-            return 'Hibernating'
-        else:
-            return 'Need Attention'
+    # Segmentation (règles évaluées dans l'ordre: la première condition vraie l'emporte)
+    r = rfm['R_score'].to_numpy()
+    f = rfm['F_score'].to_numpy()
+    m = rfm['M_score'].to_numpy()
     
-    rfm['segment'] = rfm.apply(assign_segment, axis=1)
+    conditions = [
+        (r >= 4) & (f >= 4) & (m >= 4),
+        (r >= 3) & (f >= 3) & (m >= 3),
+        (r >= 3) & (f <= 2) & (m >= 3),
+        (r >= 4) & (f <= 2) & (m <= 2),
+        (r <= 2) & (f >= 3) & (m >= 3),
+        (r <= 2) & (f <= 2) & (m <= 2),
+        (r <= 2) & (f >= 3) & (m <= 2),
+    ]
+    segments = [
+        'Champions',
+        'Loyal',
+        'Potential Loyalist',
+        'New Customers',
+        'At Risk',
+        'Lost',
+        'Hibernating',
+    ]
+    rfm['segment'] = np.select(conditions, segments, default='Need Attention').astype(object)
     
     # Statistiques par segment
     rfm_summary = rfm.groupby('segment').agg({
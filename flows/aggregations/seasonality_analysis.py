@@ -1,7 +1,32 @@
 """Analyse de saisonnalité pour la couche Gold"""
 
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 
+from ._numba_agg import groupby_nunique
+
+# Même spécification d'agrégation pour tous les axes de saisonnalité
+SEASONALITY_AGG = {
+    'montant': ['sum', 'mean', 'count'],
+    'id_achat': 'count'
+}
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTH_NAMES = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+               'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
+
+
+def _aggregate_seasonality(fact_achats: pd.DataFrame, key: str, nb_col: str) -> pd.DataFrame:
+    """Agrège la table de faits selon un axe de saisonnalité"""
+    # as_index=False: la clé sort directement en colonne (pas de reset_index)
+    agg = fact_achats.groupby(key, observed=True, as_index=False).agg(SEASONALITY_AGG)
+    agg.columns = [key, 'ca_total', 'ca_moyen', nb_col, 'nb_achats']
+    # Clients distincts via le noyau numba
+    agg.insert(4, 'nb_clients_uniques', groupby_nunique(fact_achats, key, ['id_client'])['id_client'])
+    return agg
+
 
 def calculate_seasonality(fact_achats: pd.DataFrame) -> dict:
     """
@@ -13,81 +38,40 @@ def calculate_seasonality(fact_achats: pd.DataFrame) -> dict:
     Returns:
         Dict avec analyses de saisonnalité
     """
-    # Par jour de la semaine
-    seasonality_dow = fact_achats.groupby('jour_semaine').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count'
-    }).reset_index()
-    
-    seasonality_dow.columns = [
-        'jour_semaine',
-        'ca_total',
-        'ca_moyen',
-        'nb_jours',
-        'nb_clients_uniques',
-        'nb_achats'
-    ]
+    # Les quatre axes sont indépendants: agrégés en parallèle (pandas libère le GIL)
+    axes = {
+        'dow': ('jour_semaine_num', 'nb_jours'),
+        'hour': ('heure', 'nb_heures'),
+        'month': ('mois', 'nb_mois'),
+        'weekend': ('est_weekend', 'nb_periodes'),
+    }
+    with ThreadPoolExecutor(max_workers=len(axes)) as executor:
+        futures = {
+            name: executor.submit(_aggregate_seasonality, fact_achats, key, nb_col)
+            for name, (key, nb_col) in axes.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
     
-    # Ordre des jours
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    seasonality_dow['jour_order'] = seasonality_dow['jour_semaine'].apply(lambda x: day_order.index(x) if x in day_order else 99)
-    seasonality_dow = seasonality_dow.sort_values('jour_order')
+    # Par jour de la semaine: groupé sur le numéro du jour (0 = lundi), déjà dans l'ordre.
+    # Catégoriel ordonné: l'ordre des jours est porté par le type (plus de colonne jour_order)
+    seasonality_dow = results['dow']
+    jour_codes = seasonality_dow.pop('jour_semaine_num').to_numpy()
+    seasonality_dow.insert(0, 'jour_semaine', pd.Categorical.from_codes(jour_codes, categories=DAY_ORDER, ordered=True))
     
     # Par heure de la journée
-    seasonality_hour = fact_achats.groupby('heure').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count'
-    }).reset_index()
-    
-    seasonality_hour.columns = [
-        'heure',
-        'ca_total',
-        'ca_moyen',
-        'nb_heures',
-        'nb_clients_uniques',
-        'nb_achats'
-    ]
+    seasonality_hour = results['hour']
     
     # Par mois
-    seasonality_month = fact_achats.groupby('mois').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count'
-    }).reset_index()
+    seasonality_month = results['month']
     
-    seasonality_month.columns = [
-        'mois',
-        'ca_total',
-        'ca_moyen',
-        'nb_mois',
-        'nb_clients_uniques',
-        'nb_achats'
-    ]
-    
-    # Noms des mois
-    month_names = {1: 'Janvier', 2: 'Février', 3: 'Mars', 4: 'Avril',
-                   5: 'Mai', 6: 'Juin', 7: 'Juillet', 8: 'Août',
-                   9: 'Septembre', 10: 'Octobre', 11: 'Novembre', 12: 'Décembre'}
-    seasonality_month['mois_nom'] = seasonality_month['mois'].map(month_names)
+    # Noms des mois (catégoriel ordonné Janvier..Décembre, construit depuis les codes)
+    seasonality_month['mois_nom'] = pd.Categorical.from_codes(
+        seasonality_month['mois'].to_numpy() - 1, categories=MONTH_NAMES, ordered=True
+    )
     
     # Weekend vs semaine
-    seasonality_weekend = fact_achats.groupby('est_weekend').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count'
-    }).reset_index()
-    
-    seasonality_weekend.columns = [
-        'est_weekend',
-        'ca_total',
-        'ca_moyen',
-        'nb_periodes',
-        'nb_clients_uniques',
-        'nb_achats'
-    ]
-    seasonality_weekend['type'] = seasonality_weekend['est_weekend'].apply(lambda x: 'Weekend' if x else 'Semaine')
+    seasonality_weekend = results['weekend']
+    seasonality_weekend['type'] = np.where(seasonality_weekend['est_weekend'].to_numpy(), 'Weekend', 'Semaine').astype(object)
     
     return {
         'by_day_of_week': seasonality_dow,
@@ -95,4 +79,3 @@ def calculate_seasonality(fact_achats: pd.DataFrame) -> dict:
         'by_month': seasonality_month,
         'weekend_vs_week': seasonality_weekend
     }
-
@@ -3,54 +3,70 @@
 import pandas as pd
 import numpy as np
 
+from ._numba_agg import count_outside, describe_moments
+from .client_aggregations import aggregate_by_client
 
-def calculate_statistical_distributions(fact_achats: pd.DataFrame) -> dict:
+
+def calculate_statistical_distributions(fact_achats: pd.DataFrame, client_aggs: pd.DataFrame = None) -> dict:
     """
     Calcule les distributions statistiques.
     
     Args:
         fact_achats: Table de faits
+        client_aggs: Agrégats par client (aggregate_by_client), recalculés si absents
     
     Returns:
         Dict avec distributions statistiques
     """
-    # Distribution des montants
-    montant_stats = fact_achats['montant'].describe()
+    # Distribution des montants: tous les quantiles en un seul calcul
+    montant = fact_achats['montant']
+    quartile_probs = [0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+    decile_probs = [i/10 for i in range(1, 10)]
+    all_quantiles = montant.quantile(sorted(set(quartile_probs + decile_probs)))
     
     # Quartiles et déciles
-    quartiles = fact_achats['montant'].quantile([0.25, 0.5, 0.75, 0.9, 0.95, 0.99])
-    deciles = fact_achats['montant'].quantile([i/10 for i in range(1, 10)])
+    quartiles = all_quantiles.loc[quartile_probs]
+    deciles = all_quantiles.loc[decile_probs]
+    
+    # Moments (count, mean, std, min, max, skew, kurtosis) en un seul appel natif
+    moments = describe_moments(montant)
+    
+    montant_stats = pd.Series({
+        'count': moments['count'],
+        'mean': moments['mean'],
+        'std': moments['std'],
+        'min': moments['min'],
+        '25%': quartiles[0.25],
+        '50%': quartiles[0.5],
+        '75%': quartiles[0.75],
+        'max': moments['max'],
+    }, name='montant')
     
     # Skewness et Kurtosis
-    skewness = fact_achats['montant'].skew()
-    kurtosis = fact_achats['montant'].kurtosis()
+    skewness = moments['skew']
+    kurtosis = moments['kurtosis']
     
     # Distribution par client
-    client_stats = fact_achats.groupby('id_client').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_achat': 'count'
-    }).reset_index()
+    if client_aggs is None:
+        client_aggs = aggregate_by_client(fact_achats)
     
-    client_stats.columns = ['id_client', 'ca_total', 'panier_moyen', 'nb_achats', 'nb_achats_total']
+    client_stats = client_aggs[['ca_total', 'panier_moyen', 'nb_achats', 'nb_achats_total']].reset_index()
     
     ca_total_stats = client_stats['ca_total'].describe()
     nb_achats_stats = client_stats['nb_achats_total'].describe()
     
     # Distribution par produit
-    produit_stats = fact_achats.groupby('produit')['montant'].agg(['mean', 'std', 'min', 'max']).reset_index()
+    produit_stats = fact_achats.groupby('produit', observed=True, as_index=False)['montant'].agg(['mean', 'std', 'min', 'max'])
     produit_stats.columns = ['produit', 'montant_moyen', 'montant_std', 'montant_min', 'montant_max']
     
-    # Outliers (méthode IQR)
-    Q1 = fact_achats['montant'].quantile(0.25)
-    Q3 = fact_achats['montant'].quantile(0.75)
+    # Outliers (méthode IQR): seulement comptés, sans extraire les lignes
+    Q1 = quartiles[0.25]
+    Q3 = quartiles[0.75]
     IQR = Q3 - Q1
     lower_bound = Q1 - 1.5 * IQR
     upper_bound = Q3 + 1.5 * IQR
     
-    outliers = fact_achats[
-        (fact_achats['montant'] < lower_bound) | 
-        (fact_achats['montant'] > upper_bound)
-    ]
+    nb_outliers = int(count_outside(montant.to_numpy(dtype=np.float64), lower_bound, upper_bound))
     
     # Résumé des distributions
     distributions_summary = pd.DataFrame([{
@@ -67,8 +83,8 @@ def calculate_statistical_distributions(fact_achats: pd.DataFrame) -> dict:
         'q99': quartiles[0.99],
         'skewness': skewness,
         'kurtosis': kurtosis,
-        'nb_outliers': len(outliers),
-        'pct_outliers': len(outliers) / len(fact_achats) * 100
+        'nb_outliers': nb_outliers,
+        'pct_outliers': nb_outliers / len(fact_achats) * 100
     }])
     
     return {
@@ -77,7 +93,6 @@ def calculate_statistical_distributions(fact_achats: pd.DataFrame) -> dict:
         'deciles': deciles,
         'distributions_summary': distributions_summary,
         'client_stats': client_stats,
-        'produit_stats': produit_stats,
-        'outliers': outliers
+        'produit_stats': produit_stats
     }
 
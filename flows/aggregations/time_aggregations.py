@@ -3,27 +3,51 @@
 import pandas as pd
 from typing import Dict
 
+from ._numba_agg import factorize_groups, group_stats, nunique_by_codes
+
+
+def _aggregate_period(fact_achats: pd.DataFrame, key: str, with_produits: bool = True) -> Dict[str, object]:
+    """
+    Statistiques par période en un seul passage sur montant/date_achat.
+    
+    La clé est factorisée une fois (ordre trié, comme groupby), puis les noyaux
+    numba calculent sum/mean/min/max/count et les comptages distincts.
+    
+    Args:
+        fact_achats: Table de faits
+        key: Colonne de période (date_achat, annee_semaine, annee_mois, heure)
+        with_produits: Calculer aussi le nombre de produits distincts
+    
+    Returns:
+        Dict avec les valeurs de la clé et les statistiques par groupe
+    """
+    group_codes, periods = factorize_groups(fact_achats[key])
+    ngroups = len(periods)
+    
+    stats = group_stats(group_codes, ngroups, fact_achats['montant'], fact_achats['date_achat'])
+    stats['periods'] = periods
+    stats['nb_clients_uniques'] = nunique_by_codes(group_codes, ngroups, fact_achats['id_client'])
+    if with_produits:
+        stats['nb_produits_differents'] = nunique_by_codes(group_codes, ngroups, fact_achats['produit'])
+    return stats
+
 
 def aggregate_by_day(fact_achats: pd.DataFrame) -> pd.DataFrame:
     """Agrège les données par jour"""
-    agg = fact_achats.groupby('date_achat').agg({
-        'montant': ['sum', 'mean', 'min', 'max', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count',
-        'produit': 'nunique'
-    }).reset_index()
-    
-    agg.columns = [
-        'date',
-        'ca_total',
-        'ca_moyen',
-        'ca_min',
-        'ca_max',
-        'nb_achats',
-        'nb_clients_uniques',
-        'nb_achats_total',
-        'nb_produits_differents'
-    ]
+    stats = _aggregate_period(fact_achats, 'date_achat')
+    
+    # id_achat n'est jamais nul (int64 en Silver): count == taille du groupe
+    agg = pd.DataFrame({
+        'date': stats['periods'],
+        'ca_total': stats['sum'],
+        'ca_moyen': stats['mean'],
+        'ca_min': stats['min'],
+        'ca_max': stats['max'],
+        'nb_achats': stats['count'],
+        'nb_clients_uniques': stats['nb_clients_uniques'],
+        'nb_achats_total': stats['size'],
+        'nb_produits_differents': stats['nb_produits_differents']
+    })
     
     agg['panier_moyen'] = agg['ca_total'] / agg['nb_achats']
     
@@ -32,25 +56,19 @@ def aggregate_by_day(fact_achats: pd.DataFrame) -> pd.DataFrame:
 
 def aggregate_by_week(fact_achats: pd.DataFrame) -> pd.DataFrame:
     """Agrège les données par semaine"""
-    agg = fact_achats.groupby('annee_semaine').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count',
-        'produit': 'nunique',
-        'date_achat': ['min', 'max']
-    }).reset_index()
-    
-    agg.columns = [
-        'annee_semaine',
-        'ca_total',
-        'ca_moyen',
-        'nb_achats',
-        'nb_clients_uniques',
-        'nb_achats_total',
-        'nb_produits_differents',
-        'date_debut',
-        'date_fin'
-    ]
+    stats = _aggregate_period(fact_achats, 'annee_semaine')
+    
+    agg = pd.DataFrame({
+        'annee_semaine': stats['periods'],
+        'ca_total': stats['sum'],
+        'ca_moyen': stats['mean'],
+        'nb_achats': stats['count'],
+        'nb_clients_uniques': stats['nb_clients_uniques'],
+        'nb_achats_total': stats['size'],
+        'nb_produits_differents': stats['nb_produits_differents'],
+        'date_debut': stats['date_min'],
+        'date_fin': stats['date_max']
+    })
     
     agg['panier_moyen'] = agg['ca_total'] / agg['nb_achats']
     
@@ -59,25 +77,19 @@ def aggregate_by_week(fact_achats: pd.DataFrame) -> pd.DataFrame:
 
 def aggregate_by_month(fact_achats: pd.DataFrame) -> pd.DataFrame:
     """Agrège les données par mois"""
-    agg = fact_achats.groupby('annee_mois').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count',
-        'produit': 'nunique',
-        'date_achat': ['min', 'max']
-    }).reset_index()
-    
-    agg.columns = [
-        'annee_mois',
-        'ca_total',
-        'ca_moyen',
-        'nb_achats',
-        'nb_clients_uniques',
-        'nb_achats_total',
-        'nb_produits_differents',
-        'date_debut',
-        'date_fin'
-    ]
+    stats = _aggregate_period(fact_achats, 'annee_mois')
+    
+    agg = pd.DataFrame({
+        'annee_mois': stats['periods'],
+        'ca_total': stats['sum'],
+        'ca_moyen': stats['mean'],
+        'nb_achats': stats['count'],
+        'nb_clients_uniques': stats['nb_clients_uniques'],
+        'nb_achats_total': stats['size'],
+        'nb_produits_differents': stats['nb_produits_differents'],
+        'date_debut': stats['date_min'],
+        'date_fin': stats['date_max']
+    })
     
     agg['panier_moyen'] = agg['ca_total'] / agg['nb_achats']
     
@@ -91,22 +103,17 @@ def aggregate_by_month(fact_achats: pd.DataFrame) -> pd.DataFrame:
 
 def aggregate_by_hour(fact_achats: pd.DataFrame) -> pd.DataFrame:
     """Agrège les données par heure de la journée"""
-    agg = fact_achats.groupby('heure').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique',
-        'id_achat': 'count'
-    }).reset_index()
-    
-    agg.columns = [
-        'heure',
-        'ca_total',
-        'ca_moyen',
-        'nb_achats',
-        'nb_clients_uniques',
-        'nb_achats_total'
-    ]
+    stats = _aggregate_period(fact_achats, 'heure', with_produits=False)
+    
+    agg = pd.DataFrame({
+        'heure': stats['periods'],
+        'ca_total': stats['sum'],
+        'ca_moyen': stats['mean'],
+        'nb_achats': stats['count'],
+        'nb_clients_uniques': stats['nb_clients_uniques'],
+        'nb_achats_total': stats['size']
+    })
     
     agg['panier_moyen'] = agg['ca_total'] / agg['nb_achats']
     
     return agg
-
@@ -1,11 +1,11 @@
-from io import BytesIO
 from pathlib import Path
 from typing import Dict, List
 
 from prefect import flow, task
+from minio.commonconfig import CopySource
 from minio.error import S3Error
 
-from config import BUCKET_BRONZE, BUCKET_SOURCES, get_minio_client
+from config import BUCKET_BRONZE, BUCKET_SOURCES, ensure_bucket, get_minio_client
 
 
 @task(name="upload_to_sources", retries=2)
@@ -23,8 +23,7 @@ def upload_csv_to_souces(file_path: str, object_name: str) -> str:
 
     client = get_minio_client()
 
-    if not client.bucket_exists(BUCKET_SOURCES):
-        client.make_bucket(BUCKET_SOURCES)
+    ensure_bucket(BUCKET_SOURCES)
 
     client.fput_object(BUCKET_SOURCES, object_name, file_path)
     print(f"✅ Uploaded {object_name} to {BUCKET_SOURCES}")
@@ -45,20 +44,10 @@ def copy_to_bronze_layer(object_name: str) -> str:
 
     client = get_minio_client()
 
-    if not client.bucket_exists(BUCKET_BRONZE):
-        client.make_bucket(BUCKET_BRONZE)
+    ensure_bucket(BUCKET_BRONZE)
 
-    response = client.get_object(BUCKET_SOURCES, object_name)
-    data = response.read()
-    response.close()
-    response.release_conn()
-
-    client.put_object(
-        BUCKET_BRONZE,
-        object_name,
-        BytesIO(data),
-        length=len(data),
-    )
+    # Copie côté serveur : les octets de l'objet ne transitent pas par le client
+    client.copy_object(BUCKET_BRONZE, object_name, CopySource(BUCKET_SOURCES, object_name))
     print(f"✅ Copied {object_name} to {BUCKET_BRONZE}")
     return object_name
 
@@ -90,8 +79,8 @@ def bronze_ingestion_flow(data_dir: str = "./data/sources") -> Dict[str, Dict[st
     Flow principal : upload des fichiers CSV vers sources et copie vers bronze.
 
     - Découvre automatiquement tous les fichiers *.csv dans data_dir
-    - Upload chaque fichier vers le bucket `sources`
-    - Copie chaque objet vers le bucket `bronze`
+    - Upload chaque fichier vers le bucket `sources` (en parallèle)
+    - Copie chaque objet vers le bucket `bronze` dès que son upload est terminé
     - Continue même si un fichier échoue (robustesse à de nouvelles données)
 
     Args:
@@ -110,12 +99,18 @@ def bronze_ingestion_flow(data_dir: str = "./data/sources") -> Dict[str, Dict[st
     results_success: Dict[str, str] = {}
     results_failed: Dict[str, str] = {}
 
+    # Soumission concurrente : chaque copie bronze attend uniquement son propre upload
+    submitted = []
     for file_path in csv_files:
         object_name = file_path.name  # on garde le même nom dans MinIO
+        upload_future = upload_csv_to_souces.submit(str(file_path), object_name)
+        copy_future = copy_to_bronze_layer.submit(upload_future)
+        submitted.append((object_name, upload_future, copy_future))
 
+    for object_name, upload_future, copy_future in submitted:
         try:
-            uploaded_name = upload_csv_to_souces(str(file_path), object_name)
-            bronze_name = copy_to_bronze_layer(uploaded_name)
+            upload_future.result()
+            bronze_name = copy_future.result()
             results_success[object_name] = bronze_name
         except (FileNotFoundError, S3Error, OSError) as e:
             msg = f"{type(e).__name__}: {e}"
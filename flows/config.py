@@ -1,11 +1,17 @@
 import os
+from functools import lru_cache
 from pathlib import Path
+from threading import Lock
 
 from dotenv import load_dotenv
 from minio import Minio
+from pyarrow.fs import S3FileSystem
 
 load_dotenv()
 
+# Cache des noyaux numba compilés (aggregations), partagé entre les runs Prefect
+os.environ.setdefault("NUMBA_CACHE_DIR", str(Path(__file__).resolve().parent / ".numba_cache"))
+
 # MinIO configuration
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
@@ -24,7 +30,9 @@ BUCKET_BRONZE = "bronze"
 BUCKET_SILVER = "silver"
 BUCKET_GOLD = "gold"
 
+@lru_cache(maxsize=1)
 def get_minio_client() -> Minio: 
+    """Client MinIO partagé (pool de connexions urllib3 réutilisé entre les tâches)."""
     return Minio(
         MINIO_ENDPOINT,
         access_key=MINIO_ACCESS_KEY,
@@ -32,6 +40,32 @@ def get_minio_client() -> Minio:
         secure=MINIO_SECURE
     )
 
+@lru_cache(maxsize=1)
+def get_arrow_filesystem() -> S3FileSystem:
+    """Accès S3 natif Arrow vers MinIO (lectures Parquet par blocs, sans buffer Python)."""
+    return S3FileSystem(
+        endpoint_override=MINIO_ENDPOINT,
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        scheme="https" if MINIO_SECURE else "http",
+    )
+
+# Buckets dont l'existence a déjà été vérifiée dans ce processus
+_buckets_ready = set()
+_buckets_lock = Lock()
+
+def ensure_bucket(bucket_name: str) -> None:
+    """Crée le bucket s'il n'existe pas (une seule vérification par bucket et par processus)."""
+    if bucket_name in _buckets_ready:
+        return
+    with _buckets_lock:
+        if bucket_name in _buckets_ready:
+            return
+        client = get_minio_client()
+        if not client.bucket_exists(bucket_name):
+            client.make_bucket(bucket_name)
+        _buckets_ready.add(bucket_name)
+
 def configure_prefect() -> None:
     os.environ["PREFECT_API_URL"] = PREFECT_API_URL
 
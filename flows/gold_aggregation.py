@@ -1,16 +1,22 @@
 """Flow d'agrégation Gold : calcul des KPIs et métriques métier"""
 
-from io import BytesIO
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from prefect import flow, task
 from minio.error import S3Error
 
-from config import BUCKET_SILVER, BUCKET_GOLD, get_minio_client
+from config import BUCKET_SILVER, BUCKET_GOLD, ensure_bucket, get_arrow_filesystem
 from aggregations import (
     create_dim_clients,
     create_dim_produits,
     create_dim_temps,
     create_fact_achats,
+    aggregate_by_client,
     aggregate_by_day,
     aggregate_by_week,
     aggregate_by_month,
@@ -31,32 +37,55 @@ from ml import enrich_with_ml
 
 
 @task(name="read_silver_parquet", retries=2)
-def read_silver_parquet(object_name: str) -> pd.DataFrame:
+def read_silver_parquet(object_name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
     """
     Lit un fichier Parquet depuis le bucket Silver.
     
     Args:
         object_name: Nom du fichier dans MinIO (ex: "clients.parquet")
+        columns: Colonnes à lire (toutes si None)
     
     Returns:
         DataFrame pandas
     """
-    client = get_minio_client()
+    fs = get_arrow_filesystem()
     
     try:
-        response = client.get_object(BUCKET_SILVER, object_name)
-        df = pd.read_parquet(BytesIO(response.read()))
-        response.close()
-        response.release_conn()
+        # Arrow lit l'objet par plages depuis MinIO (pas de copie bytes + BytesIO);
+        # self_destruct libère les buffers Arrow au fur et à mesure de la conversion
+        table = pq.read_table(f"{BUCKET_SILVER}/{object_name}", filesystem=fs, columns=columns)
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
         
         print(f"✅ Lu {object_name}: {len(df)} lignes, {len(df.columns)} colonnes")
         return df
     
-    except S3Error as e:
+    except (S3Error, OSError) as e:
         print(f"❌ Erreur lecture {object_name}: {e}")
         raise
 
 
+# Taille maximale d'un row group Parquet (tables de faits)
+MAX_ROW_GROUP_SIZE = 262_144
+
+
+def _write_params(nb_lignes: int) -> Dict[str, Any]:
+    """
+    Paramètres d'écriture Parquet selon la taille de la table.
+    
+    zstd niveau 3: fichiers ~2x plus petits que snappy pour le dashboard, décodage transparent.
+    Les petites tables (KPIs, dim_temps, agrégats) tiennent en un seul row group:
+    un seul bloc de métadonnées et pas de recherche entre groupes à la lecture.
+    """
+    return {
+        'compression': 'zstd',
+        'compression_level': 3,
+        'use_dictionary': True,
+        'write_statistics': True,
+        'row_group_size': min(max(nb_lignes, 1), MAX_ROW_GROUP_SIZE),
+    }
+
+
 @task(name="write_gold_parquet", retries=2)
 def write_parquet_to_gold(df: pd.DataFrame, object_path: str) -> str:
     """
@@ -69,32 +98,89 @@ def write_parquet_to_gold(df: pd.DataFrame, object_path: str) -> str:
     Returns:
         Chemin du fichier écrit
     """
-    client = get_minio_client()
-    
-    # Créer le bucket s'il n'existe pas
-    if not client.bucket_exists(BUCKET_GOLD):
-        client.make_bucket(BUCKET_GOLD)
-    
-    # Convertir DataFrame en Parquet (en mémoire)
-    parquet_buffer = BytesIO()
-    df.to_parquet(parquet_buffer, index=False, engine='pyarrow')
-    parquet_buffer.seek(0)
-    
-    # Upload vers MinIO
-    client.put_object(
-        BUCKET_GOLD,
-        object_path,
-        parquet_buffer,
-        length=parquet_buffer.getbuffer().nbytes,
-        content_type='application/octet-stream'
-    )
-    
-    file_size_mb = parquet_buffer.getbuffer().nbytes / (1024 * 1024)
+    # Créer le bucket s'il n'existe pas (vérifié une fois par processus)
+    ensure_bucket(BUCKET_GOLD)
+    
+    # Parquet écrit directement dans MinIO via S3FileSystem (upload multipart en flux):
+    # ni BytesIO ni fichier temporaire
+    fs = get_arrow_filesystem()
+    path = f"{BUCKET_GOLD}/{object_path}"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, path, filesystem=fs, **_write_params(table.num_rows))
+    file_size_mb = fs.get_file_info(path).size / (1024 * 1024)
+    
     print(f"✅ Écrit {object_path} vers {BUCKET_GOLD} ({file_size_mb:.2f} MB)")
     
     return object_path
 
 
+# Nombre de threads pour les agrégations Gold (pandas libère le GIL dans groupby/agg)
+GOLD_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def run_gold_aggregations(
+    fact_achats: pd.DataFrame,
+    clients_df: pd.DataFrame,
+    client_aggs: pd.DataFrame
+) -> Dict[str, Any]:
+    """
+    Calcule toutes les agrégations et métriques Gold en parallèle.
+    
+    Chaque fonction lit uniquement les DataFrames d'entrée (aucune mutation),
+    elles peuvent donc tourner dans des threads sans copie.
+    
+    Args:
+        fact_achats: Table de faits
+        clients_df: DataFrame des clients
+        client_aggs: Agrégats par client (aggregate_by_client)
+    
+    Returns:
+        Dict nom -> résultat de l'agrégation
+    """
+    tasks = {
+        'ca_jour': partial(aggregate_by_day, fact_achats),
+        'ca_semaine': partial(aggregate_by_week, fact_achats),
+        'ca_mois': partial(aggregate_by_month, fact_achats),
+        'ca_heure': partial(aggregate_by_hour, fact_achats),
+        'ca_pays': partial(aggregate_by_country, fact_achats),
+        'rfm': partial(calculate_rfm_segmentation, fact_achats, client_aggs=client_aggs),
+        'clv': partial(calculate_clv_metrics, fact_achats, clients_df, client_aggs=client_aggs),
+        'retention': partial(calculate_retention_metrics, fact_achats, clients_df, client_aggs=client_aggs),
+        'produits': partial(calculate_product_metrics, fact_achats, client_aggs=client_aggs),
+        'cohortes': partial(calculate_cohort_analysis, fact_achats, clients_df),
+        'saisonnalite': partial(calculate_seasonality, fact_achats),
+        'distributions': partial(calculate_statistical_distributions, fact_achats, client_aggs=client_aggs),
+        'concentration': partial(calculate_concentration_metrics, fact_achats, client_aggs=client_aggs),
+        'kpis_globaux': partial(calculate_global_kpis, fact_achats, clients_df, client_aggs=client_aggs),
+        'croissance': partial(calculate_growth_metrics, fact_achats),
+    }
+    
+    with ThreadPoolExecutor(max_workers=GOLD_WORKERS) as executor:
+        futures = {name: executor.submit(func) for name, func in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def run_ml_enrichment(datasets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Enrichit plusieurs datasets avec le ML en parallèle (un thread par dataset).
+    
+    Les modèles sklearn (IsolationForest, KMeans, PCA) passent l'essentiel de leur
+    temps dans du code natif qui libère le GIL: les datasets avancent en même temps.
+    
+    Args:
+        datasets: Dict nom -> DataFrame Silver
+    
+    Returns:
+        Dict nom -> DataFrame enrichi
+    """
+    if not datasets:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=len(datasets)) as executor:
+        futures = {name: executor.submit(enrich_with_ml, df, name) for name, df in datasets.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
 @flow(name="Gold Aggregation Flow")
 def gold_aggregation_flow() -> dict:
     """
@@ -119,13 +205,17 @@ def gold_aggregation_flow() -> dict:
     
     # ===== ENRICHISSEMENT ML =====
     print("\n🤖 Enrichissement avec Machine Learning...")
-    if not clients_df.empty:
-        clients_df = enrich_with_ml(clients_df, "clients")
+    # Les deux datasets sont enrichis en parallèle (sklearn libère le GIL)
+    ml_inputs = {"clients": clients_df, "achats": achats_df}
+    enriched = run_ml_enrichment({name: df for name, df in ml_inputs.items() if not df.empty})
+    
+    if "clients" in enriched:
+        clients_df = enriched["clients"]
         # Sauvegarder la version enrichie ML
         write_parquet_to_gold(clients_df, "ml/clients_enriched_ml.parquet")
     
-    if not achats_df.empty:
-        achats_df = enrich_with_ml(achats_df, "achats")
+    if "achats" in enriched:
+        achats_df = enriched["achats"]
         # Sauvegarder la version enrichie ML
         write_parquet_to_gold(achats_df, "ml/achats_enriched_ml.parquet")
     
@@ -134,9 +224,10 @@ def gold_aggregation_flow() -> dict:
     dim_clients = create_dim_clients(clients_df)
     dim_produits = create_dim_produits(achats_df)
     
-    # Dimension temps (calendrier)
-    date_min = pd.to_datetime(achats_df['date_achat']).min()
-    date_max = pd.to_datetime(achats_df['date_achat']).max()
+    # Dimension temps (calendrier): Silver fournit déjà des datetime, conversion seulement si besoin
+    if not pd.api.types.is_datetime64_any_dtype(achats_df['date_achat']):
+        achats_df['date_achat'] = pd.to_datetime(achats_df['date_achat'], format='ISO8601', cache=True)
+    date_min, date_max = achats_df['date_achat'].agg(['min', 'max'])
     dim_temps = create_dim_temps(date_min, date_max)
     
     # Écrire dimensions
@@ -149,12 +240,19 @@ def gold_aggregation_flow() -> dict:
     fact_achats = create_fact_achats(achats_df, clients_df)
     write_parquet_to_gold(fact_achats, "facts/fact_achats.parquet")
     
+    # Agrégats par client calculés une fois, partagés par les métriques ci-dessous
+    client_aggs = aggregate_by_client(fact_achats)
+    
+    # ===== AGRÉGATIONS ET MÉTRIQUES (en parallèle) =====
+    print(f"\n⚡ Calcul parallèle des agrégations ({GOLD_WORKERS} threads)...")
+    results = run_gold_aggregations(fact_achats, clients_df, client_aggs)
+    
     # ===== AGRÉGATIONS TEMPORELLES =====
-    print("\n⏰ Calcul des agrégations temporelles...")
-    fact_ca_jour = aggregate_by_day(fact_achats)
-    fact_ca_semaine = aggregate_by_week(fact_achats)
-    fact_ca_mois = aggregate_by_month(fact_achats)
-    fact_ca_heure = aggregate_by_hour(fact_achats)
+    print("\n⏰ Écriture des agrégations temporelles...")
+    fact_ca_jour = results['ca_jour']
+    fact_ca_semaine = results['ca_semaine']
+    fact_ca_mois = results['ca_mois']
+    fact_ca_heure = results['ca_heure']
     
     write_parquet_to_gold(fact_ca_jour, "facts/fact_ca_jour.parquet")
     write_parquet_to_gold(fact_ca_semaine, "facts/fact_ca_semaine.parquet")
@@ -162,32 +260,32 @@ def gold_aggregation_flow() -> dict:
     write_parquet_to_gold(fact_ca_heure, "facts/fact_ca_heure.parquet")
     
     # ===== AGRÉGATIONS GÉOGRAPHIQUES =====
-    print("\n🌍 Calcul des agrégations géographiques...")
-    fact_ca_pays = aggregate_by_country(fact_achats)
+    print("\n🌍 Écriture des agrégations géographiques...")
+    fact_ca_pays = results['ca_pays']
     write_parquet_to_gold(fact_ca_pays, "facts/fact_ca_pays.parquet")
     
     # ===== SEGMENTATION RFM =====
-    print("\n🎯 Calcul de la segmentation RFM...")
-    rfm_detail, rfm_summary = calculate_rfm_segmentation(fact_achats)
+    print("\n🎯 Écriture de la segmentation RFM...")
+    rfm_detail, rfm_summary = results['rfm']
     write_parquet_to_gold(rfm_detail, "dimensions/dim_rfm.parquet")
     write_parquet_to_gold(rfm_summary, "kpis/kpi_rfm.parquet")
     
     # ===== CLV METRICS =====
-    print("\n💰 Calcul des métriques CLV...")
-    clv_detail, clv_by_country = calculate_clv_metrics(fact_achats, clients_df)
+    print("\n💰 Écriture des métriques CLV...")
+    clv_detail, clv_by_country = results['clv']
     write_parquet_to_gold(clv_detail, "kpis/kpi_clv_detail.parquet")
     write_parquet_to_gold(clv_by_country, "kpis/kpi_clv_pays.parquet")
     
     # ===== RETENTION METRICS =====
-    print("\n🔄 Calcul des métriques de rétention...")
-    retention_results = calculate_retention_metrics(fact_achats, clients_df)
+    print("\n🔄 Écriture des métriques de rétention...")
+    retention_results = results['retention']
     write_parquet_to_gold(retention_results['retention_detail'], "kpis/kpi_retention_detail.parquet")
     write_parquet_to_gold(retention_results['retention_summary'], "kpis/kpi_retention_summary.parquet")
     write_parquet_to_gold(retention_results['global_metrics'], "kpis/kpi_retention_global.parquet")
     
     # ===== PRODUCT METRICS =====
-    print("\n📦 Calcul des métriques produits...")
-    product_results = calculate_product_metrics(fact_achats)
+    print("\n📦 Écriture des métriques produits...")
+    product_results = results['produits']
     write_parquet_to_gold(product_results['product_metrics'], "kpis/kpi_produits.parquet")
     write_parquet_to_gold(product_results['top_products_ca'], "kpis/kpi_top_produits_ca.parquet")
     write_parquet_to_gold(product_results['top_products_volume'], "kpis/kpi_top_produits_volume.parquet")
@@ -195,43 +293,43 @@ def gold_aggregation_flow() -> dict:
     write_parquet_to_gold(product_results['diversity_summary'], "kpis/kpi_diversite_summary.parquet")
     
     # ===== COHORT ANALYSIS =====
-    print("\n👥 Calcul de l'analyse par cohortes...")
-    cohort_results = calculate_cohort_analysis(fact_achats, clients_df)
+    print("\n👥 Écriture de l'analyse par cohortes...")
+    cohort_results = results['cohortes']
     write_parquet_to_gold(cohort_results['cohort_ca'], "analytics/analytics_cohortes_ca.parquet")
     write_parquet_to_gold(cohort_results['cohort_total'], "analytics/analytics_cohortes_total.parquet")
     write_parquet_to_gold(cohort_results['cohort_retention'], "analytics/analytics_cohortes_retention.parquet")
     
     # ===== SEASONALITY =====
-    print("\n📅 Calcul de l'analyse de saisonnalité...")
-    seasonality_results = calculate_seasonality(fact_achats)
+    print("\n📅 Écriture de l'analyse de saisonnalité...")
+    seasonality_results = results['saisonnalite']
     write_parquet_to_gold(seasonality_results['by_day_of_week'], "analytics/analytics_saisonnalite_jour.parquet")
     write_parquet_to_gold(seasonality_results['by_hour'], "analytics/analytics_saisonnalite_heure.parquet")
     write_parquet_to_gold(seasonality_results['by_month'], "analytics/analytics_saisonnalite_mois.parquet")
     write_parquet_to_gold(seasonality_results['weekend_vs_week'], "analytics/analytics_saisonnalite_weekend.parquet")
     
     # ===== STATISTICAL DISTRIBUTIONS =====
-    print("\n📈 Calcul des distributions statistiques...")
-    stats_results = calculate_statistical_distributions(fact_achats)
+    print("\n📈 Écriture des distributions statistiques...")
+    stats_results = results['distributions']
     write_parquet_to_gold(stats_results['distributions_summary'], "analytics/analytics_distributions_summary.parquet")
     write_parquet_to_gold(stats_results['client_stats'], "analytics/analytics_distributions_clients.parquet")
     write_parquet_to_gold(stats_results['produit_stats'], "analytics/analytics_distributions_produits.parquet")
     
     # ===== CONCENTRATION METRICS =====
-    print("\n📊 Calcul des métriques de concentration...")
-    concentration_results = calculate_concentration_metrics(fact_achats)
+    print("\n📊 Écriture des métriques de concentration...")
+    concentration_results = results['concentration']
     write_parquet_to_gold(concentration_results['concentration_summary'], "analytics/analytics_concentration_summary.parquet")
     write_parquet_to_gold(concentration_results['client_concentration'], "analytics/analytics_concentration_clients.parquet")
     write_parquet_to_gold(concentration_results['country_concentration'], "analytics/analytics_concentration_pays.parquet")
     write_parquet_to_gold(concentration_results['product_concentration'], "analytics/analytics_concentration_produits.parquet")
     
     # ===== GLOBAL KPIS =====
-    print("\n🎯 Calcul des KPIs globaux...")
-    global_kpis = calculate_global_kpis(fact_achats, clients_df)
+    print("\n🎯 Écriture des KPIs globaux...")
+    global_kpis = results['kpis_globaux']
     write_parquet_to_gold(global_kpis, "kpis/kpi_globaux.parquet")
     
     # ===== GROWTH METRICS =====
-    print("\n📈 Calcul des métriques de croissance...")
-    growth_results = calculate_growth_metrics(fact_achats)
+    print("\n📈 Écriture des métriques de croissance...")
+    growth_results = results['croissance']
     write_parquet_to_gold(growth_results['monthly_growth'], "kpis/kpi_croissance_mensuelle.parquet")
     write_parquet_to_gold(growth_results['growth_summary'], "kpis/kpi_croissance_summary.parquet")
     
@@ -2,10 +2,91 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
+BIN_LABELS = ['Very Low', 'Low', 'Medium', 'High', 'Very High']
+
+
+def _quintile_bins(values: pd.Series) -> Optional[pd.Series]:
+    """
+    Quintiles d'une colonne numérique, comme `pd.qcut(values, q=5, labels=BIN_LABELS)`.
+    
+    Les bornes sont calculées une fois (np.nanquantile) puis chaque valeur est
+    placée par recherche dichotomique, codes int8 sans passer par qcut.
+    
+    Args:
+        values: Colonne numérique
+    
+    Returns:
+        Series catégorielle ordonnée, ou None si des bornes sont confondues
+        (trop de valeurs identiques pour former 5 classes)
+    """
+    vals = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    edges = np.nanquantile(vals, np.linspace(0, 1, 6))
+    if np.unique(edges).size != edges.size:
+        return None
+    
+    # Intervalles fermés à droite ]e_i, e_i+1] (le minimum tombe dans la première classe)
+    codes = np.searchsorted(edges[1:-1], vals, side='left').astype(np.int8)
+    codes[np.isnan(vals)] = -1
+    binned = pd.Categorical.from_codes(codes, categories=BIN_LABELS, ordered=True)
+    return pd.Series(binned, index=values.index, name=values.name)
+
+
+def _date_features(dates: pd.Series, now: pd.Timestamp, with_days_since: bool = True) -> Dict[str, pd.Series]:
+    """
+    Année, mois, jour, jour de la semaine, weekend (et âge en jours) d'une colonne date.
+    
+    Sans NaT, les composantes sont obtenues par troncature datetime64 numpy
+    (une allocation par attribut, dtypes identiques à l'accesseur .dt).
+    
+    Args:
+        dates: Colonne datetime64[ns]
+        now: Date de référence pour l'âge en jours
+        with_days_since: Calculer aussi l'âge en jours
+    
+    Returns:
+        Dict suffixe de colonne -> Series
+    """
+    col = dates.name
+    
+    if dates.isna().any():
+        # NaT: l'accesseur .dt gère les valeurs manquantes (résultats en float)
+        dayofweek = dates.dt.dayofweek
+        features = {
+            f"{col}_year": dates.dt.year,
+            f"{col}_month": dates.dt.month,
+            f"{col}_day": dates.dt.day,
+            f"{col}_dayofweek": dayofweek,
+            f"{col}_is_weekend": dayofweek.isin([5, 6]),
+        }
+        if with_days_since:
+            features[f"{col}_days_since"] = (now - dates).dt.days
+        return features
+    
+    values = dates.to_numpy(dtype='datetime64[ns]')
+    years = values.astype('datetime64[Y]')
+    months = values.astype('datetime64[M]')
+    days = values.astype('datetime64[D]')
+    # 1970-01-01 était un jeudi (3 avec lundi = 0)
+    dayofweek = (days.view('i8') + 3) % 7
+    
+    index = dates.index
+    features = {
+        f"{col}_year": pd.Series((years.view('i8') + 1970).astype(np.int32), index=index),
+        f"{col}_month": pd.Series(((months - years).astype('i8') + 1).astype(np.int32), index=index),
+        f"{col}_day": pd.Series(((days - months).astype('i8') + 1).astype(np.int32), index=index),
+        f"{col}_dayofweek": pd.Series(dayofweek.astype(np.int32), index=index),
+        f"{col}_is_weekend": pd.Series(dayofweek >= 5, index=index),
+    }
+    if with_days_since:
+        # Division entière (arrondi vers le bas, comme Timedelta.days)
+        features[f"{col}_days_since"] = pd.Series((now.value - values.view('i8')) // 86_400_000_000_000, index=index)
+    return features
+
+
 def extract_features_auto(df: pd.DataFrame, dataset_name: str = "dataset") -> pd.DataFrame:
     """
     Extrait automatiquement des features depuis n'importe quel DataFrame.
@@ -21,72 +102,87 @@ def extract_features_auto(df: pd.DataFrame, dataset_name: str = "dataset") -> pd
     if df.empty:
         return df
     
-    df_features = df.copy()
-    
     print(f"🔧 Extraction de features pour {dataset_name}...")
     
+    # Pas de copie du DataFrame source: les nouvelles colonnes sont collectées
+    # dans un dict et ajoutées en une seule concaténation à la fin
+    new_features = {}
+    
+    def column(name: str) -> pd.Series:
+        """Colonne source ou feature déjà créée"""
+        return new_features[name] if name in new_features else df[name]
+    
     # 1. Features temporelles (si colonnes de dates détectées)
-    date_cols = [col for col in df_features.columns 
-                 if df_features[col].dtype == 'datetime64[ns]']
+    date_cols = [col for col in df.columns 
+                 if df[col].dtype == 'datetime64[ns]']
     
+    # Date de référence calculée une fois pour toutes les colonnes
+    now = pd.Timestamp.now()
     for col in date_cols:
-        df_features[f"{col}_year"] = df_features[col].dt.year
-        df_features[f"{col}_month"] = df_features[col].dt.month
-        df_features[f"{col}_day"] = df_features[col].dt.day
-        df_features[f"{col}_dayofweek"] = df_features[col].dt.dayofweek
-        df_features[f"{col}_is_weekend"] = df_features[col].dt.dayofweek.isin([5, 6])
-        
-        # Âge en jours depuis la date
-        if col != 'date_achat':  # Éviter les calculs redondants
-            df_features[f"{col}_days_since"] = (pd.Timestamp.now() - df_features[col]).dt.days
+        new_features.update(_date_features(df[col], now, with_days_since=(col != 'date_achat')))
     
-    # 2. Features numériques (statistiques)
-    numeric_cols = df_features.select_dtypes(include=[np.number]).columns
+    # 2. Features numériques (statistiques), moyennes / écarts-types / cardinalités
+    # calculés en une fois sur toutes les colonnes (source + features temporelles)
+    date_features = pd.DataFrame(new_features, index=df.index)
+    numeric = pd.concat(
+        [df.select_dtypes(include=[np.number]), date_features.select_dtypes(include=[np.number])],
+        axis=1
+    )
+    numeric_cols = numeric.columns
+    means = numeric.mean()
+    stds = numeric.std()
+    nuniques = numeric.nunique()
+    normalized = (numeric - means) / stds
     
     for col in numeric_cols:
         # Normalisation (z-score)
-        mean_val = df_features[col].mean()
-        std_val = df_features[col].std()
-        if std_val > 0:
-            df_features[f"{col}_normalized"] = (df_features[col] - mean_val) / std_val
+        if stds[col] > 0:
+            new_features[f"{col}_normalized"] = normalized[col]
         
-        # Binning (catégorisation)
-        if df_features[col].nunique() > 10:
-            df_features[f"{col}_binned"] = pd.qcut(
-                df_features[col], 
-                q=5, 
-                labels=['Very Low', 'Low', 'Medium', 'High', 'Very High'],
-                duplicates='drop'
-            )
+        # Binning (catégorisation) en quintiles
+        if nuniques[col] > 10:
+            binned = _quintile_bins(numeric[col])
+            if binned is not None:
+                new_features[f"{col}_binned"] = binned
     
     # 3. Features catégorielles (encodage)
-    categorical_cols = df_features.select_dtypes(include=['object', 'string']).columns
+    categorical_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
     
     for col in categorical_cols:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Colonnes catégorielles de Silver (pays, produit): mêmes features que le texte
+            values = values.astype(object)
+        
         # Fréquence d'encodage (combien de fois cette valeur apparaît)
-        value_counts = df_features[col].value_counts()
-        df_features[f"{col}_frequency"] = df_features[col].map(value_counts)
+        value_counts = values.value_counts()
+        new_features[f"{col}_frequency"] = values.map(value_counts)
         
         # Top N categories (garder seulement les top 10, le reste = "Other")
-        if df_features[col].nunique() > 10:
+        # value_counts déjà calculé: sa longueur est le nombre de valeurs distinctes
+        if len(value_counts) > 10:
             top_categories = value_counts.head(10).index
-            df_features[f"{col}_top_category"] = df_features[col].apply(
-                lambda x: x if x in top_categories else "Other"
-            )
+            new_features[f"{col}_top_category"] = values.where(
+                values.isin(top_categories), "Other"
+            ).astype('category')
     
     # 4. Features d'interaction (si plusieurs colonnes numériques)
     if len(numeric_cols) >= 2:
         # Ratio entre les deux premières colonnes numériques
         col1, col2 = numeric_cols[0], numeric_cols[1]
-        if (df_features[col2] != 0).any():
-            df_features[f"{col1}_div_{col2}"] = df_features[col1] / (df_features[col2] + 1e-6)
+        if (numeric[col2] != 0).any():
+            new_features[f"{col1}_div_{col2}"] = numeric[col1] / (numeric[col2] + 1e-6)
     
     # 5. Features de comptage (si colonnes ID détectées)
-    id_cols = [col for col in df_features.columns if 'id' in col.lower()]
+    id_cols = [col for col in [*df.columns, *new_features] if 'id' in col.lower()]
     for id_col in id_cols:
         # Nombre d'occurrences de cet ID
-        id_counts = df_features[id_col].value_counts()
-        df_features[f"{id_col}_count"] = df_features[id_col].map(id_counts)
+        id_values = column(id_col)
+        id_counts = id_values.value_counts()
+        new_features[f"{id_col}_count"] = id_values.map(id_counts)
+    
+    # Ajout de toutes les nouvelles colonnes en une seule concaténation, sans copier df
+    df_features = pd.concat([df, pd.DataFrame(new_features, index=df.index)], axis=1, copy=False)
     
     print(f"✅ {len(df_features.columns) - len(df.columns)} nouvelles features créées")
     
@@ -3,14 +3,20 @@
 import pandas as pd
 import numpy as np
 from typing import Dict, Optional
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import IsolationForest
-from sklearn.decomposition import PCA
+from sklearn.decomposition import PCA, IncrementalPCA
 from .feature_engineering import extract_features_auto
 import warnings
 warnings.filterwarnings('ignore')
 
+# Nombre de lignes à partir duquel le clustering passe en MiniBatchKMeans
+MINIBATCH_MIN_ROWS = 50_000
+
+# Nombre de lignes à partir duquel la PCA est calculée par lots (IncrementalPCA)
+INCREMENTAL_PCA_MIN_ROWS = 100_000
+
 
 def detect_anomalies_ml(df: pd.DataFrame, contamination: float = 0.1) -> pd.DataFrame:
     """
@@ -35,18 +41,20 @@ def detect_anomalies_ml(df: pd.DataFrame, contamination: float = 0.1) -> pd.Data
         return df_result
     
     # Préparer les données
-    X = df_result[numeric_cols].fillna(0)
+    # Pas de standardisation: Isolation Forest coupe chaque feature à un seuil tiré
+    # entre son min et son max, il est insensible à l'échelle des colonnes.
+    # float32 C-contigu: le format de travail de sklearn (pas de copie cachée)
+    X = np.ascontiguousarray(df_result[numeric_cols].fillna(0).to_numpy(dtype=np.float32))
     
-    # Standardiser
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Isolation Forest (arbres construits et parcourus en parallèle)
+    iso_forest = IsolationForest(contamination=contamination, random_state=42, n_jobs=-1)
+    iso_forest.fit(X)
     
-    # Isolation Forest
-    iso_forest = IsolationForest(contamination=contamination, random_state=42)
-    anomalies = iso_forest.fit_predict(X_scaled)
-    
-    df_result['is_anomaly_ml'] = anomalies == -1
-    df_result['anomaly_score'] = iso_forest.score_samples(X_scaled)
+    # Un seul parcours des arbres pour le score: predict() revient à score < offset_
+    scores = iso_forest.score_samples(X)
+    df_result['is_anomaly_ml'] = scores < iso_forest.offset_
+    # float32: précision suffisante pour le classement, moitié moins de mémoire et de Parquet
+    df_result['anomaly_score'] = scores.astype(np.float32)
     
     n_anomalies = df_result['is_anomaly_ml'].sum()
     print(f"🔍 ML: {n_anomalies} anomalie(s) détectée(s) ({n_anomalies/len(df_result)*100:.2f}%)")
@@ -86,24 +94,35 @@ def cluster_data(df: pd.DataFrame, n_clusters: Optional[int] = None) -> pd.DataF
     
     # Standardiser
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # float32 C-contigu: le format de travail de sklearn (pas de copie cachée)
+    X_scaled = np.ascontiguousarray(scaler.fit_transform(X), dtype=np.float32)
     
     # Réduction de dimension si trop de features
     if X_scaled.shape[1] > 10:
-        pca = PCA(n_components=10, random_state=42)
-        X_scaled = pca.fit_transform(X_scaled)
+        # SVD randomisée (10 composantes seulement); IncrementalPCA par lots au-delà
+        # de INCREMENTAL_PCA_MIN_ROWS lignes pour garder une mémoire constante
+        if len(X_scaled) > INCREMENTAL_PCA_MIN_ROWS:
+            pca = IncrementalPCA(n_components=10, batch_size=4096)
+        else:
+            pca = PCA(n_components=10, svd_solver='randomized', n_oversamples=5, random_state=42)
+        X_scaled = np.ascontiguousarray(pca.fit_transform(X_scaled), dtype=np.float32)
         print(f"📊 PCA appliqué: {X_scaled.shape[1]} composantes principales")
     
-    # K-Means
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X_scaled)
+    # K-Means: Elkan (inégalité triangulaire) sur les petits volumes,
+    # mini-batchs au-delà de MINIBATCH_MIN_ROWS lignes
+    if len(X_scaled) < MINIBATCH_MIN_ROWS:
+        kmeans = KMeans(n_clusters=n_clusters, algorithm='elkan', n_init=3, random_state=42)
+    else:
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=4096, max_iter=100, n_init=3, random_state=42)
+    kmeans.fit(X_scaled)
     
-    df_result['ml_cluster'] = clusters
+    df_result['ml_cluster'] = kmeans.labels_
     df_result['ml_cluster_distance'] = kmeans.transform(X_scaled).min(axis=1)
     
     print(f"🎯 ML: {n_clusters} cluster(s) créé(s)")
-    for i in range(n_clusters):
-        count = (df_result['ml_cluster'] == i).sum()
+    # Tailles des clusters en un seul passage sur les labels
+    counts = np.bincount(kmeans.labels_, minlength=n_clusters)
+    for i, count in enumerate(counts):
         print(f"   Cluster {i}: {count} éléments ({count/len(df_result)*100:.1f}%)")
     
     return df_result
@@ -130,26 +149,24 @@ def predict_scores(df: pd.DataFrame) -> pd.DataFrame:
         df_result['ml_score'] = 0.5
         return df_result
     
-    # Score composite basé sur plusieurs métriques
-    scores = []
+    # Score composite basé sur plusieurs métriques (limité à 5 colonnes pour éviter la surcharge)
+    # Normalisation min-max de toutes les colonnes en une opération sur le bloc 2-D;
+    # les colonnes constantes sont ignorées
+    M = df_result[numeric_cols[:5]].to_numpy(dtype=np.float64)
+    col_min = np.nanmin(M, axis=0)
+    col_range = np.nanmax(M, axis=0) - col_min
+    keep = col_range > 0
     
-    for col in numeric_cols[:5]:  # Limiter à 5 colonnes pour éviter la surcharge
-        # Normaliser entre 0 et 1
-        col_min = df_result[col].min()
-        col_max = df_result[col].max()
-        if col_max > col_min:
-            normalized = (df_result[col] - col_min) / (col_max - col_min)
-            scores.append(normalized)
-    
-    if scores:
+    if keep.any():
         # Score moyen (peut être remplacé par un modèle plus sophistiqué)
-        df_result['ml_score'] = pd.concat(scores, axis=1).mean(axis=1)
+        normalized = (M[:, keep] - col_min[keep]) / col_range[keep]
+        ml_score = np.nanmean(normalized, axis=1)
     else:
-        df_result['ml_score'] = 0.5
+        ml_score = np.full(len(df_result), 0.5)
     
     # Normaliser le score final entre 0 et 100
-    df_result['ml_score'] = (df_result['ml_score'] - df_result['ml_score'].min()) / \
-                            (df_result['ml_score'].max() - df_result['ml_score'].min() + 1e-6) * 100
+    ml_score = (ml_score - np.nanmin(ml_score)) / (np.nanmax(ml_score) - np.nanmin(ml_score) + 1e-6) * 100
+    df_result['ml_score'] = ml_score.astype(np.float32)
     
     print(f"📈 ML: Scores prédits (moyenne: {df_result['ml_score'].mean():.2f})")
     
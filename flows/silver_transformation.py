@@ -1,17 +1,44 @@
 """Flow de transformation Silver : nettoyage et normalisation des données"""
 
-from io import BytesIO
-from typing import Dict, Any
+from typing import Any, Dict, Optional
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 from prefect import flow, task
+from prefect.task_runners import ThreadPoolTaskRunner
 from minio.error import S3Error
 
-from config import BUCKET_BRONZE, BUCKET_SILVER, get_minio_client
-from transformations.data_cleaning import clean_clients_data, clean_achats_data, clean_data_generic
+from config import BUCKET_BRONZE, BUCKET_SILVER, ensure_bucket, get_arrow_filesystem, get_minio_client
+from transformations.data_cleaning import TEXT_DTYPE, clean_clients_data, clean_achats_data, clean_data_generic
 from transformations.quality_checks import validate_data_quality, generate_quality_report
 
 
+# Taille des blocs lus par le lecteur CSV Arrow (un bloc par thread)
+CSV_BLOCK_SIZE = 8 << 20
+
+# Nombre de lignes par row group des fichiers Parquet Silver
+SILVER_ROW_GROUP_SIZE = 131_072
+
+# Tâches Silver exécutées en parallèle (lectures MinIO, nettoyages, écritures)
+SILVER_WORKERS = 8
+
+# Types imposés au lecteur CSV pour les datasets connus: le texte arrive directement
+# dans les types de normalize_data_types (string, category) au lieu de colonnes object
+# reconverties ensuite. Colonnes texte uniquement: une conversion impossible ferait
+# échouer la lecture, les colonnes numériques et dates restent inférées puis nettoyées.
+BRONZE_COLUMN_TYPES = {
+    "clients": {
+        "nom": pa.string(),
+        "email": pa.string(),
+        "pays": pa.dictionary(pa.int32(), pa.string())
+    },
+    "achats": {
+        "produit": pa.dictionary(pa.int32(), pa.string())
+    }
+}
+
 # Règles de qualité
 QUALITY_RULES = {
     "clients": {
@@ -43,12 +70,17 @@ QUALITY_RULES = {
 
 
 @task(name="read_bronze_csv", retries=2)
-def read_bronze_csv(object_name: str) -> pd.DataFrame:
+def read_bronze_csv(
+    object_name: str,
+    column_types: Optional[Dict[str, pa.DataType]] = None
+) -> pd.DataFrame:
     """
     Lit un fichier CSV depuis le bucket Bronze.
     
     Args:
         object_name: Nom du fichier dans MinIO (ex: "clients.csv")
+        column_types: Types Arrow imposés à certaines colonnes (BRONZE_COLUMN_TYPES),
+                      le texte est alors lu en TEXT_DTYPE sans copie (dictionnaires en category)
     
     Returns:
         DataFrame pandas
@@ -57,15 +89,24 @@ def read_bronze_csv(object_name: str) -> pd.DataFrame:
 
     try:
         response = client.get_object(BUCKET_BRONZE, object_name)
-        raw = response.read()
-        response.close()
-        response.release_conn()
-
-        if not raw:
-            print(f"⚠️ Fichier vide dans bronze: {object_name}")
-            return pd.DataFrame()
-
-        df = pd.read_csv(BytesIO(raw))
+        try:
+            # Lecteur CSV C++ multithreadé d'Arrow, alimenté directement par la réponse
+            # HTTP (pas de copie des octets bruts dans un BytesIO)
+            table = pv.read_csv(
+                response,
+                read_options=pv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=True),
+                convert_options=pv.ConvertOptions(strings_can_be_null=True, column_types=column_types)
+            )
+        finally:
+            response.close()
+            response.release_conn()
+
+        # Types numpy (et dates en datetime64[ns]) attendus par le nettoyage
+        df = table.to_pandas(
+            date_as_object=False,
+            coerce_temporal_nanoseconds=True,
+            types_mapper={pa.string(): TEXT_DTYPE}.get if column_types else None
+        )
 
         if df.empty:
             print(f"⚠️ DataFrame vide après lecture de {object_name}")
@@ -73,6 +114,11 @@ def read_bronze_csv(object_name: str) -> pd.DataFrame:
         print(f"✅ Lu {object_name}: {len(df)} lignes, {len(df.columns)} colonnes")
         return df
 
+    except pa.ArrowInvalid as e:
+        # Fichier vide (ou CSV illisible): même comportement qu'un fichier sans données
+        print(f"⚠️ Fichier vide dans bronze: {object_name} ({e})")
+        return pd.DataFrame()
+
     except S3Error as e:
         print(f"❌ Erreur lecture {object_name}: {e}")
         return pd.DataFrame()
@@ -90,31 +136,33 @@ def write_parquet_to_silver(df: pd.DataFrame, object_name: str) -> str:
     Returns:
         Nom du fichier écrit
     """
-    client = get_minio_client()
-
     if df is None or df.empty:
         print(f"⚠️ DataFrame vide, aucun fichier écrit pour {object_name}")
         return ""
 
     # Créer le bucket s'il n'existe pas
-    if not client.bucket_exists(BUCKET_SILVER):
-        client.make_bucket(BUCKET_SILVER)
-
-    # Convertir DataFrame en Parquet (en mémoire)
-    parquet_buffer = BytesIO()
-    df.to_parquet(parquet_buffer, index=False, engine="pyarrow")
-    parquet_buffer.seek(0)
-
-    # Upload vers MinIO
-    client.put_object(
-        BUCKET_SILVER,
-        object_name,
-        parquet_buffer,
-        length=parquet_buffer.getbuffer().nbytes,
-        content_type="application/octet-stream",
+    ensure_bucket(BUCKET_SILVER)
+
+    # Parquet écrit directement dans MinIO via S3FileSystem (upload multipart en flux,
+    # pas de fichier complet en mémoire)
+    # zstd niveau 3 (~2x plus compact que snappy), row groups de 128k lignes,
+    # dictionnaire pour les colonnes peu distinctes et statistiques pour le filtrage
+    fs = get_arrow_filesystem()
+    path = f"{BUCKET_SILVER}/{object_name}"
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table,
+        path,
+        filesystem=fs,
+        compression="zstd",
+        compression_level=3,
+        row_group_size=SILVER_ROW_GROUP_SIZE,
+        use_dictionary=True,
+        write_statistics=True,
+        data_page_size=1 << 20,
     )
 
-    file_size_mb = parquet_buffer.getbuffer().nbytes / (1024 * 1024)
+    file_size_mb = fs.get_file_info(path).size / (1024 * 1024)
     print(f"✅ Écrit {object_name} vers {BUCKET_SILVER} ({file_size_mb:.2f} MB)")
 
     return object_name
@@ -199,7 +247,42 @@ def validate_generic_quality(df: pd.DataFrame, dataset_name: str) -> dict:
     return report
 
 
-@flow(name="Silver Transformation Flow")
+@task(name="clean_bronze_dataset")
+def clean_bronze_dataset(
+    df_raw: pd.DataFrame,
+    dataset_name: str,
+    use_specific_cleaners: bool = True,
+    clients_df: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Nettoie un dataset Bronze: cleaner spécifique (clients/achats) ou générique.
+    
+    Args:
+        df_raw: DataFrame brut lu depuis Bronze
+        dataset_name: Nom du dataset (nom du fichier sans extension)
+        use_specific_cleaners: Utiliser clean_clients_data/clean_achats_data pour les fichiers connus
+        clients_df: Clients nettoyés, pour l'intégrité référentielle des achats
+    
+    Returns:
+        DataFrame nettoyé (vide si le fichier brut est vide)
+    """
+    if df_raw is None or df_raw.empty:
+        return pd.DataFrame()
+
+    if use_specific_cleaners and dataset_name == "clients":
+        return clean_clients_data(df_raw)
+
+    if use_specific_cleaners and dataset_name == "achats":
+        valid_client_ids = None
+        if clients_df is not None and not clients_df.empty and "id_client" in clients_df.columns:
+            valid_client_ids = clients_df["id_client"]
+        return clean_achats_data(df_raw, valid_client_ids=valid_client_ids)
+
+    # Fichier inconnu ou mode entièrement générique
+    return clean_data_generic(df_raw, dataset_name)
+
+
+@flow(name="Silver Transformation Flow", task_runner=ThreadPoolTaskRunner(max_workers=SILVER_WORKERS))
 def silver_transformation_flow(use_specific_cleaners: bool = True) -> Dict[str, Any]:
     """
     Flow principal de transformation Silver - VERSION GÉNÉRIQUE.
@@ -231,14 +314,52 @@ def silver_transformation_flow(use_specific_cleaners: bool = True) -> Dict[str,
     summary: Dict[str, Any] = {}
     quality_reports = []
 
-    # Traiter chaque fichier découvert
-    for csv_file in csv_files:
-        dataset_name = csv_file.replace('.csv', '')
+    # Lectures Bronze toutes lancées en parallèle (I/O réseau)
+    datasets = {csv_file: csv_file.replace('.csv', '') for csv_file in csv_files}
+    raw_futures = {
+        csv_file: read_bronze_csv.submit(
+            csv_file,
+            BRONZE_COLUMN_TYPES.get(datasets[csv_file]) if use_specific_cleaners else None
+        )
+        for csv_file in csv_files
+    }
+
+    # Nettoyage / validation / écriture soumis par fichier: seuls les achats attendent
+    # les clients nettoyés (intégrité référentielle), les autres fichiers sont indépendants
+    clients_future = None
+    submitted = {}
+    for csv_file in sorted(csv_files, key=lambda f: datasets[f] != "clients"):
+        dataset_name = datasets[csv_file]
         print(f"\n📋 Traitement de {csv_file}...")
-        
-        # Lire depuis Bronze
-        df_raw = read_bronze_csv(csv_file)
-        
+
+        depends_on_clients = use_specific_cleaners and dataset_name == "achats"
+        clean_future = clean_bronze_dataset.submit(
+            raw_futures[csv_file],
+            dataset_name,
+            use_specific_cleaners,
+            clients_future if depends_on_clients else None,
+        )
+        if use_specific_cleaners and dataset_name == "clients":
+            clients_future = clean_future
+
+        # Validation selon le cleaner utilisé
+        if use_specific_cleaners and dataset_name == "clients":
+            quality_future = validate_clients_quality.submit(clean_future)
+        elif use_specific_cleaners and dataset_name == "achats":
+            quality_future = validate_achats_quality.submit(clean_future)
+        else:
+            quality_future = validate_generic_quality.submit(clean_future, dataset_name)
+
+        # Écrire vers Silver
+        write_future = write_parquet_to_silver.submit(clean_future, f"{dataset_name}.parquet")
+        submitted[csv_file] = (clean_future, quality_future, write_future)
+
+    # Résultats dans l'ordre de découverte des fichiers
+    for csv_file in csv_files:
+        dataset_name = datasets[csv_file]
+        clean_future, quality_future, write_future = submitted[csv_file]
+        df_raw = raw_futures[csv_file].result()
+
         if df_raw is None or df_raw.empty:
             print(f"⚠️ Fichier {csv_file} vide ou non lisible, ignoré.")
             summary[dataset_name] = {
@@ -249,47 +370,13 @@ def silver_transformation_flow(use_specific_cleaners: bool = True) -> Dict[str,
             }
             continue
 
-        # Nettoyage : utiliser les cleaners spécifiques si disponibles, sinon générique
-        if use_specific_cleaners:
-            if dataset_name == "clients":
-                df_clean = clean_clients_data(df_raw)
-                quality = validate_clients_quality(df_clean)
-            elif dataset_name == "achats":
-                # Pour achats, on a besoin des clients pour l'intégrité référentielle
-                # On vérifie si clients a déjà été traité dans ce flow
-                valid_client_ids = None
-                if "clients" in summary and summary["clients"]["status"] == "ok":
-                    # Charger les clients depuis Silver
-                    try:
-                        client = get_minio_client()
-                        response = client.get_object(BUCKET_SILVER, "clients.parquet")
-                        import pyarrow.parquet as pq
-                        clients_df = pd.read_parquet(BytesIO(response.read()))
-                        response.close()
-                        response.release_conn()
-                        if not clients_df.empty and "id_client" in clients_df.columns:
-                            valid_client_ids = clients_df["id_client"]
-                    except:
-                        pass
-                df_clean = clean_achats_data(df_raw, valid_client_ids=valid_client_ids)
-                quality = validate_achats_quality(df_clean)
-            else:
-                # Fichier inconnu : nettoyage générique
-                df_clean = clean_data_generic(df_raw, dataset_name)
-                quality = validate_generic_quality(df_clean, dataset_name)
-        else:
-            # Mode entièrement générique
-            df_clean = clean_data_generic(df_raw, dataset_name)
-            quality = validate_generic_quality(df_clean, dataset_name)
-
-        # Écrire vers Silver
-        parquet_name = f"{dataset_name}.parquet"
-        parquet_file = write_parquet_to_silver(df_clean, parquet_name)
+        df_clean = clean_future.result()
+        quality = quality_future.result()
 
         summary[dataset_name] = {
             "status": "ok" if not df_clean.empty else "empty",
             "rows": len(df_clean),
-            "file": parquet_file,
+            "file": write_future.result(),
             "quality": quality,
         }
         
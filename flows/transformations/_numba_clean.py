@@ -0,0 +1,27 @@
+"""
+Noyaux numba pour le nettoyage de la couche Silver.
+
+Signatures explicites + cache=True: compilés une fois et rechargés depuis le cache
+aux runs suivants (NUMBA_CACHE_DIR défini dans config).
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit('Tuple((boolean[:], int64))(float64[:], float64, float64)', cache=True, nogil=True)
+def iqr_inside_mask(values, lower, upper):
+    """
+    Masque des valeurs dans [lower, upper] et nombre de valeurs strictement hors
+    de l'intervalle, en un seul passage et une seule allocation.
+    
+    Les NaN ne sont ni dans l'intervalle ni comptés comme hors intervalle,
+    comme les comparaisons pandas.
+    """
+    inside = np.empty(values.size, np.bool_)
+    outside = 0
+    for i in range(values.size):
+        v = values[i]
+        inside[i] = (v >= lower) & (v <= upper)
+        outside += (v < lower) | (v > upper)
+    return inside, outside
@@ -1,16 +1,46 @@
 """Fonctions de nettoyage des données pour la couche Silver"""
 
+import re
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from typing import Optional, List, Dict
 from datetime import datetime
 
+from ._numba_clean import iqr_inside_mask
+
+
+# Dtype "string" stocké en Arrow: opérations .str exécutées par les noyaux C++ d'Arrow
+# (pas d'objet Python par cellule), toujours égal à "string" pour les comparaisons de dtype
+TEXT_DTYPE = pd.StringDtype("pyarrow")
+
+# Détection des colonnes par leur nom (nettoyage générique), motifs compilés une fois
+DATE_COLUMN_PATTERN = re.compile(r"date|time|created|updated", re.IGNORECASE)
+EMAIL_COLUMN_PATTERN = re.compile(r"mail", re.IGNORECASE)
+
+
+def _contains(values: pd.Series, pattern: str) -> np.ndarray:
+    """
+    Masque `values.str.contains(pattern, regex=False, na=False)` calculé par le noyau
+    UTF-8 vectorisé d'Arrow (repli sur pandas si la colonne n'est pas du texte).
+    """
+    try:
+        arr = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        arr = None
+    if arr is None or not (pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type)):
+        return values.str.contains(pattern, regex=False, na=False).to_numpy(dtype=bool)
+    return pc.fill_null(pc.match_substring(arr, pattern), False).to_numpy(zero_copy_only=False)
+
 
 def handle_missing_values(
     df: pd.DataFrame,
     strategy: str = "drop",
     columns: Optional[List[str]] = None,
-    fill_value: Optional[any] = None
+    fill_value: Optional[any] = None,
+    copy: bool = True
 ) -> pd.DataFrame:
     """
     Gère les valeurs manquantes selon une stratégie.
@@ -20,11 +50,13 @@ def handle_missing_values(
         strategy: "drop" (supprimer), "fill" (remplacer), "forward_fill"
         columns: Colonnes spécifiques à traiter (None = toutes)
         fill_value: Valeur de remplacement si strategy="fill"
+        copy: Copier df avant modification (False si df appartient déjà à l'appelant)
     
     Returns:
         DataFrame nettoyé
     """
-    df_clean = df.copy()
+    # dropna renvoie déjà un nouveau DataFrame: copie seulement pour les remplissages
+    df_clean = df.copy() if copy and strategy != "drop" else df
     
     if columns is None:
         columns = df_clean.columns.tolist()
@@ -33,14 +65,29 @@ def handle_missing_values(
         df_clean = df_clean.dropna(subset=columns)
     elif strategy == "fill":
         if fill_value is not None:
-            df_clean[columns] = df_clean[columns].fillna(fill_value)
+            # Seules les colonnes avec des manquants sont remplies (catégories inchangées sinon)
+            columns = [col for col in columns if df_clean[col].isna().any()]
+            # Colonnes catégorielles: la valeur de remplacement doit être une catégorie
+            # (union triée: même ordre des catégories que si elle était présente au départ)
+            for col in columns:
+                if isinstance(df_clean[col].dtype, pd.CategoricalDtype) \
+                        and fill_value not in df_clean[col].cat.categories:
+                    categories = df_clean[col].cat.categories.union([fill_value])
+                    df_clean[col] = df_clean[col].cat.set_categories(categories)
+            if columns:
+                df_clean[columns] = df_clean[columns].fillna(fill_value)
         else:
             # Remplissage par la moyenne pour numériques, mode pour catégorielles
-            for col in columns:
-                if df_clean[col].dtype in ['int64', 'float64']:
-                    df_clean[col].fillna(df_clean[col].mean(), inplace=True)
-                else:
-                    df_clean[col].fillna(df_clean[col].mode()[0] if len(df_clean[col].mode()) > 0 else "UNKNOWN", inplace=True)
+            # (un fillna par famille de colonnes, valeurs de remplacement alignées par colonne)
+            num_cols = [col for col in columns if df_clean[col].dtype in ['int64', 'float64']]
+            cat_cols = [col for col in columns if col not in num_cols]
+            if num_cols:
+                df_clean[num_cols] = df_clean[num_cols].fillna(df_clean[num_cols].mean())
+            if cat_cols:
+                modes = df_clean[cat_cols].mode()
+                # Colonne sans mode (entièrement vide): "UNKNOWN"
+                fill_values = modes.iloc[0].fillna("UNKNOWN") if len(modes) > 0 else "UNKNOWN"
+                df_clean[cat_cols] = df_clean[cat_cols].fillna(fill_values)
     elif strategy == "forward_fill":
         df_clean[columns] = df_clean[columns].ffill()
     
@@ -50,7 +97,8 @@ def handle_missing_values(
 def standardize_dates(
     df: pd.DataFrame,
     date_columns: List[str],
-    target_format: str = "%Y-%m-%d"
+    target_format: str = "%Y-%m-%d",
+    copy: bool = True
 ) -> pd.DataFrame:
     """
     Standardise les formats de dates.
@@ -59,47 +107,71 @@ def standardize_dates(
         df: DataFrame contenant les colonnes de dates
         date_columns: Liste des colonnes de dates à standardiser
         target_format: Format cible (pour affichage)
+        copy: Copier df avant modification (False si df appartient déjà à l'appelant)
     
     Returns:
         DataFrame avec dates standardisées
     """
-    df_clean = df.copy()
+    df_clean = df.copy() if copy else df
+    today = pd.Timestamp.now()
+    keep = np.ones(len(df_clean), dtype=bool)
     
     for col in date_columns:
         if col in df_clean.columns:
-            # Convertir en datetime
-            df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce', infer_datetime_format=True)
+            # Convertir en datetime (dates ISO 8601: parseur C rapide, valeurs répétées parsées une fois)
+            df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce', format='ISO8601', cache=True)
             
-            # Supprimer les dates futures (anomalies)
-            today = pd.Timestamp.now()
-            df_clean = df_clean[df_clean[col] <= today]
+            # Dates futures (anomalies), cumulées pour toutes les colonnes
+            keep &= (df_clean[col] <= today).to_numpy()
+    
+    # Une seule sélection des lignes, quel que soit le nombre de colonnes de dates
+    if not keep.all():
+        df_clean = df_clean[keep]
     
     return df_clean
 
 
 def normalize_data_types(
     df: pd.DataFrame,
-    schema: Dict[str, str]
+    schema: Dict[str, str],
+    copy: bool = True
 ) -> pd.DataFrame:
     """
     Normalise les types de données selon un schéma.
     
     Args:
         df: DataFrame à normaliser
-        schema: Dict {colonne: type} ex: {"id": "int64", "montant": "float64"}
+        schema: Dict {colonne: type} ex: {"id": "int32", "montant": "float64", "pays": "category"}
+                ("int32" retombe sur int64 si des valeurs dépassent la plage int32)
+        copy: Copier df avant modification (False si df appartient déjà à l'appelant)
     
     Returns:
         DataFrame avec types normalisés
     """
-    df_clean = df.copy()
+    df_clean = df.copy() if copy else df
     
     for col, dtype in schema.items():
         if col in df_clean.columns:
             try:
                 if dtype == "string":
-                    df_clean[col] = df_clean[col].astype("string")
+                    df_clean[col] = df_clean[col].astype(TEXT_DTYPE)
+                elif dtype == "category":
+                    if isinstance(df_clean[col].dtype, pd.CategoricalDtype):
+                        # Déjà catégoriel (dictionnaire Arrow): mêmes catégories qu'astype,
+                        # valeurs présentes triées, sans re-hacher les chaînes
+                        values = df_clean[col].cat.remove_unused_categories()
+                        df_clean[col] = values.cat.reorder_categories(values.cat.categories.sort_values())
+                    else:
+                        df_clean[col] = df_clean[col].astype("category")
+                elif dtype == "int32":
+                    # Identifiants: int32 si toutes les valeurs tiennent, int64 sinon
+                    values = df_clean[col].astype("int64")
+                    info = np.iinfo(np.int32)
+                    if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                        values = values.astype(np.int32)
+                    df_clean[col] = values
                 elif dtype == "datetime64[ns]":
-                    df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce')
+                    df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce', format='ISO8601', cache=True)
                 else:
                     df_clean[col] = df_clean[col].astype(dtype)
             except Exception as e:
@@ -124,10 +196,9 @@ def remove_duplicates(
     Returns:
         DataFrame dédupliqué
     """
-    df_clean = df.copy()
-    
-    initial_count = len(df_clean)
-    df_clean = df_clean.drop_duplicates(subset=subset, keep=keep)
+    # drop_duplicates renvoie déjà un nouveau DataFrame: pas de copie préalable
+    initial_count = len(df)
+    df_clean = df.drop_duplicates(subset=subset, keep=keep)
     removed_count = initial_count - len(df_clean)
     
     if removed_count > 0:
@@ -148,44 +219,56 @@ def clean_clients_data(df: pd.DataFrame) -> pd.DataFrame:
     """
     print(f"📊 Nettoyage clients: {len(df)} enregistrements initiaux")
     
-    # 1. Normaliser les types
-    schema = {
-        "id_client": "int64",
-        "nom": "string",
-        "email": "string",
-        "date_inscription": "datetime64[ns]",
-        "pays": "string"
-    }
-    df_clean = normalize_data_types(df, schema)
-    
-    # 2. Supprimer les doublons sur id_client (clé primaire)
-    df_clean = remove_duplicates(df_clean, subset=["id_client"], keep="first")
+    # Tous les filtres sont combinés en un seul masque, appliqué une fois:
+    # une seule matérialisation du DataFrame au lieu d'une par étape
+    dates = pd.to_datetime(df["date_inscription"], errors='coerce', format='ISO8601', cache=True)
     
-    # 3. Supprimer les doublons sur email (doit être unique)
-    df_clean = remove_duplicates(df_clean, subset=["email"], keep="first")
+    # 1. Doublons sur id_client (clé primaire)
+    unique_id = ~df["id_client"].duplicated(keep="first")
+    removed_count = len(df) - int(unique_id.sum())
+    if removed_count > 0:
+        print(f"⚠️  {removed_count} doublon(s) supprimé(s)")
     
-    # 4. Standardiser les dates
-    df_clean = standardize_dates(df_clean, date_columns=["date_inscription"])
+    # 2. Doublons sur email (doit être unique), parmi les lignes restantes
+    # (les doublons d'id sont écartés avant: sinon leurs emails compteraient comme doublons)
+    email_dup = df.loc[unique_id, "email"].duplicated(keep="first").reindex(df.index, fill_value=False)
+    unique_email = ~email_dup
+    removed_count = int(email_dup.sum())
+    if removed_count > 0:
+        print(f"⚠️  {removed_count} doublon(s) supprimé(s)")
     
-    # 5. Gérer les valeurs nulles
-    # Supprimer les lignes avec nom ou email manquant (critique)
-    df_clean = handle_missing_values(
-        df_clean,
-        strategy="drop",
-        columns=["nom", "email"]
+    # 3. Dates futures ou invalides, nom/email manquants (critiques), email sans '@'
+    mask = (
+        unique_id
+        & unique_email
+        & (dates <= pd.Timestamp.now())
+        & df["nom"].notna()
+        & df["email"].notna()
+        & _contains(df["email"], "@")
     )
+    df_clean = df.take(np.flatnonzero(mask.to_numpy()))
+    
+    # 4. Normaliser les types sur les lignes retenues (dates déjà converties)
+    schema = {
+        # Identifiants en int32 (clés de hachage et de jointure deux fois plus petites)
+        "id_client": "int32",
+        "nom": "string",
+        "email": "string",
+        # Peu de valeurs distinctes: catégoriel (codes entiers, dictionnaire en Parquet)
+        "pays": "category"
+    }
+    df_clean = normalize_data_types(df_clean, schema, copy=False)
+    df_clean["date_inscription"] = dates[mask]
     
-    # Remplacer les pays manquants par "UNKNOWN"
+    # 5. Remplacer les pays manquants par "UNKNOWN"
     df_clean = handle_missing_values(
         df_clean,
         strategy="fill",
         columns=["pays"],
-        fill_value="UNKNOWN"
+        fill_value="UNKNOWN",
+        copy=False
     )
     
-    # 6. Validation email basique
-    df_clean = df_clean[df_clean["email"].str.contains("@", na=False)]
-    
     print(f"✅ Nettoyage clients terminé: {len(df_clean)} enregistrements valides")
     
     return df_clean
@@ -206,46 +289,60 @@ def clean_achats_data(df: pd.DataFrame, valid_client_ids: Optional[pd.Series] =
     
     # 1. Normaliser les types
     schema = {
-        "id_achat": "int64",
-        "id_client": "int64",
+        # Identifiants en int32 (clés de hachage et de jointure deux fois plus petites)
+        "id_achat": "int32",
+        "id_client": "int32",
         "date_achat": "datetime64[ns]",
         "montant": "float64",
-        "produit": "string"
+        # Peu de valeurs distinctes: catégoriel (codes entiers, dictionnaire en Parquet)
+        "produit": "category"
     }
     df_clean = normalize_data_types(df, schema)
     
-    # 2. Supprimer les doublons sur id_achat (clé primaire)
-    df_clean = remove_duplicates(df_clean, subset=["id_achat"], keep="first")
+    # Tous les filtres sont combinés en un seul masque, appliqué une fois:
+    # une seule sélection de lignes au lieu d'une par étape
     
-    # 3. Standardiser les dates
-    df_clean = standardize_dates(df_clean, date_columns=["date_achat"])
+    # 2. Doublons sur id_achat (clé primaire)
+    unique_achat = ~df_clean["id_achat"].duplicated(keep="first")
+    removed_count = len(df_clean) - int(unique_achat.sum())
+    if removed_count > 0:
+        print(f"⚠️  {removed_count} doublon(s) supprimé(s)")
     
-    # 4. Supprimer les valeurs nulles critiques
-    df_clean = handle_missing_values(
-        df_clean,
-        strategy="drop",
-        columns=["id_client", "date_achat", "montant"]
+    # 3-5. Dates futures ou invalides, valeurs critiques manquantes,
+    # montants aberrants (négatifs ou trop élevés, NaN exclus par les comparaisons)
+    mask = (
+        unique_achat
+        & (df_clean["date_achat"] <= pd.Timestamp.now())
+        & df_clean["id_client"].notna()
+        & (df_clean["montant"] > 0)
+        & (df_clean["montant"] <= 10000)
     )
     
-    # 5. Supprimer les montants aberrants (négatifs ou trop élevés)
-    df_clean = df_clean[(df_clean["montant"] > 0) & (df_clean["montant"] <= 10000)]
-    
     # 6. Intégrité référentielle : vérifier que id_client existe dans clients
     if valid_client_ids is not None:
-        initial_count = len(df_clean)
-        df_clean = df_clean[df_clean["id_client"].isin(valid_client_ids)]
-        removed_count = initial_count - len(df_clean)
+        # Ids valides dédupliqués une fois dans un Index int32 (table de hachage C)
+        valid_ids = pd.Index(np.asarray(valid_client_ids)).unique()
+        known_client = df_clean["id_client"].isin(valid_ids)
+        removed_count = int((mask & ~known_client).sum())
+        mask &= known_client
         if removed_count > 0:
             print(f"⚠️  {removed_count} achat(s) supprimé(s) (id_client invalide)")
     
+    df_clean = df_clean.take(np.flatnonzero(mask.to_numpy()))
+    
     # 7. Remplacer produit manquant par "UNKNOWN"
     df_clean = handle_missing_values(
         df_clean,
         strategy="fill",
         columns=["produit"],
-        fill_value="UNKNOWN"
+        fill_value="UNKNOWN",
+        copy=False
     )
     
+    # Catégories des produits présents uniquement dans des lignes supprimées
+    if isinstance(df_clean["produit"].dtype, pd.CategoricalDtype):
+        df_clean["produit"] = df_clean["produit"].cat.remove_unused_categories()
+    
     print(f"✅ Nettoyage achats terminé: {len(df_clean)} enregistrements valides")
     
     return df_clean
@@ -270,15 +367,18 @@ def clean_data_generic(df: pd.DataFrame, dataset_name: str = "dataset") -> pd.Da
     print(f"📊 Nettoyage générique {dataset_name}: {len(df)} enregistrements initiaux, {len(df.columns)} colonnes")
     
     df_clean = df.copy()
+    today = pd.Timestamp.now()
     
     # 1. Détection automatique et normalisation des types
     for col in df_clean.columns:
         # Détecter les colonnes de dates (par nom ou contenu)
-        if any(keyword in col.lower() for keyword in ['date', 'time', 'timestamp', 'created', 'updated']):
+        if DATE_COLUMN_PATTERN.search(col):
             try:
-                df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce', infer_datetime_format=True)
+                # Format inféré sur la première valeur (schéma inconnu: pas de format imposé);
+                # colonnes déjà datetime64[ns] (lecteur CSV Arrow) gardées telles quelles
+                if df_clean[col].dtype != 'datetime64[ns]':
+                    df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce', cache=True)
                 # Supprimer les dates futures
-                today = pd.Timestamp.now()
                 df_clean = df_clean[df_clean[col] <= today]
             except Exception as e:
                 print(f"⚠️ Impossible de convertir {col} en date: {e}")
@@ -311,22 +411,30 @@ def clean_data_generic(df: pd.DataFrame, dataset_name: str = "dataset") -> pd.Da
         print(f"⚠️ {removed_duplicates} doublon(s) complet(s) supprimé(s)")
     
     # 3. Gestion intelligente des valeurs nulles
-    for col in df_clean.columns:
-        null_count = df_clean[col].isna().sum()
-        null_pct = (null_count / len(df_clean)) * 100 if len(df_clean) > 0 else 0
-        
-        if null_pct > 50:
-            # Si >50% de nulls, on supprime la colonne (probablement inutile)
-            print(f"⚠️ Colonne {col} supprimée ({null_pct:.1f}% de valeurs nulles)")
-            df_clean = df_clean.drop(columns=[col])
-        elif null_pct > 0:
-            # Sinon, on remplit intelligemment
-            if df_clean[col].dtype in ['int64', 'float64']:
-                df_clean[col].fillna(df_clean[col].median(), inplace=True)
-            elif df_clean[col].dtype == 'datetime64[ns]':
-                df_clean[col].fillna(pd.Timestamp.now(), inplace=True)
-            else:
-                df_clean[col].fillna("UNKNOWN", inplace=True)
+    # Taux de nulls de toutes les colonnes en un passage, puis une seule suppression
+    # de colonnes et un seul fillna (les colonnes sont indépendantes entre elles)
+    null_pcts = df_clean.isna().mean() * 100 if len(df_clean) > 0 else pd.Series(0.0, index=df_clean.columns)
+    
+    # Si >50% de nulls, on supprime la colonne (probablement inutile)
+    dropped_cols = null_pcts.index[null_pcts > 50]
+    for col in dropped_cols:
+        print(f"⚠️ Colonne {col} supprimée ({null_pcts[col]:.1f}% de valeurs nulles)")
+    
+    # Sinon, on remplit intelligemment: médiane (calculée en une fois) pour les
+    # numériques, date du jour pour les dates, "UNKNOWN" pour le reste
+    fill_cols = null_pcts.index[(null_pcts > 0) & (null_pcts <= 50)]
+    dtypes = df_clean.dtypes[fill_cols]
+    num_cols = [col for col in fill_cols if dtypes[col] in ['int64', 'float64']]
+    date_cols = [col for col in fill_cols if dtypes[col] == 'datetime64[ns]']
+    fill_values = dict.fromkeys(fill_cols, "UNKNOWN")
+    fill_values.update(dict.fromkeys(date_cols, today))
+    if num_cols:
+        fill_values.update(df_clean[num_cols].median().to_dict())
+    
+    if len(dropped_cols) > 0:
+        df_clean = df_clean.drop(columns=dropped_cols)
+    if fill_values:
+        df_clean = df_clean.fillna(fill_values)
     
     # 4. Supprimer les lignes avec trop de valeurs nulles (>80%)
     threshold = len(df_clean.columns) * 0.8
@@ -337,15 +445,19 @@ def clean_data_generic(df: pd.DataFrame, dataset_name: str = "dataset") -> pd.Da
         print(f"⚠️ {removed_rows} ligne(s) supprimée(s) (trop de valeurs nulles)")
     
     # 5. Nettoyage des colonnes texte (trim, lowercase pour emails potentiels)
+    # Les filtres email sont cumulés dans un masque appliqué une seule fois
+    valid_emails = np.ones(len(df_clean), dtype=bool)
     for col in df_clean.columns:
         if df_clean[col].dtype == 'string' or df_clean[col].dtype == 'object':
             # Détecter les colonnes email
-            if 'email' in col.lower() or 'mail' in col.lower():
+            if EMAIL_COLUMN_PATTERN.search(col):
                 df_clean[col] = df_clean[col].str.lower().str.strip()
                 # Filtrer les emails invalides
-                df_clean = df_clean[df_clean[col].str.contains('@', na=False)]
+                valid_emails &= _contains(df_clean[col], '@')
             else:
                 df_clean[col] = df_clean[col].astype(str).str.strip()
+    if not valid_emails.all():
+        df_clean = df_clean[valid_emails]
     
     # 6. Détection et nettoyage des valeurs aberrantes pour les colonnes numériques
     numeric_cols = df_clean.select_dtypes(include=[np.number]).columns
@@ -356,9 +468,14 @@ def clean_data_generic(df: pd.DataFrame, dataset_name: str = "dataset") -> pd.Da
         if IQR > 0:
             lower_bound = Q1 - 3 * IQR  # Plus tolérant que 1.5
             upper_bound = Q3 + 3 * IQR
-            outliers = ((df_clean[col] < lower_bound) | (df_clean[col] > upper_bound)).sum()
+            # Masque des lignes conservées et nombre d'outliers en un seul passage
+            inside, outliers = iqr_inside_mask(
+                np.ascontiguousarray(df_clean[col].to_numpy(dtype=np.float64, na_value=np.nan)),
+                float(lower_bound),
+                float(upper_bound)
+            )
             if outliers > 0 and outliers < len(df_clean) * 0.1:  # Si <10% d'outliers
-                df_clean = df_clean[(df_clean[col] >= lower_bound) & (df_clean[col] <= upper_bound)]
+                df_clean = df_clean[inside]
                 print(f"⚠️ {outliers} valeur(s) aberrante(s) supprimée(s) dans {col}")
     
     print(f"✅ Nettoyage générique {dataset_name} terminé: {len(df_clean)} enregistrements valides")
@@ -1,6 +1,7 @@
 """Contrôles de qualité des données"""
 
 import pandas as pd
+import numpy as np
 from typing import Dict, List, Any
 from datetime import datetime
 
@@ -27,22 +28,24 @@ def validate_data_quality(
         "checks": {}
     }
     
-    # Complétude
+    # Complétude (nulls de toutes les colonnes concernées en un appel)
     if "completeness" in rules:
+        null_counts = df[[col for col in rules["completeness"] if col in df.columns]].isna().sum()
         for col, threshold in rules["completeness"].items():
             if col in df.columns:
-                completeness = (1 - df[col].isna().sum() / len(df)) * 100
+                completeness = (1 - null_counts[col] / len(df)) * 100
                 report["checks"][f"{col}_completeness"] = {
                     "value": completeness,
                     "threshold": threshold * 100,
                     "status": "✅" if completeness >= threshold * 100 else "❌"
                 }
     
-    # Unicité
+    # Unicité (valeurs distinctes de toutes les colonnes concernées en un appel)
     if "uniqueness" in rules:
+        nuniques = df[[col for col in rules["uniqueness"] if col in df.columns]].nunique()
         for col, threshold in rules["uniqueness"].items():
             if col in df.columns:
-                uniqueness = (df[col].nunique() / len(df)) * 100
+                uniqueness = (nuniques[col] / len(df)) * 100
                 report["checks"][f"{col}_uniqueness"] = {
                     "value": uniqueness,
                     "threshold": threshold * 100,
@@ -51,10 +54,11 @@ def validate_data_quality(
     
     # Validité
     if "validity" in rules:
+        now = pd.Timestamp.now()
         for col, rule in rules["validity"].items():
             if col in df.columns:
                 if rule == "not_future":
-                    future_count = (pd.to_datetime(df[col], errors='coerce') > pd.Timestamp.now()).sum()
+                    future_count = (pd.to_datetime(df[col], errors='coerce') > now).sum()
                     validity = (1 - future_count / len(df)) * 100
                     report["checks"][f"{col}_validity"] = {
                         "value": validity,
@@ -86,19 +90,19 @@ def detect_anomalies(df: pd.DataFrame, numeric_columns: List[str]) -> pd.DataFra
         DataFrame avec colonnes d'anomalies ajoutées
     """
     df_anomalies = df.copy()
+    columns = [col for col in numeric_columns if col in df_anomalies.columns]
+    if not columns:
+        return df_anomalies
     
-    for col in numeric_columns:
-        if col in df_anomalies.columns:
-            Q1 = df_anomalies[col].quantile(0.25)
-            Q3 = df_anomalies[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            df_anomalies[f"{col}_is_anomaly"] = (
-                (df_anomalies[col] < lower_bound) | 
-                (df_anomalies[col] > upper_bound)
-            )
+    # Quartiles de toutes les colonnes en un seul appel, bornes comparées sur le bloc 2-D
+    values = df_anomalies[columns].to_numpy(dtype=np.float64)
+    quartiles = df_anomalies[columns].quantile([0.25, 0.75]).to_numpy(dtype=np.float64)
+    Q1, Q3 = quartiles[0], quartiles[1]
+    IQR = Q3 - Q1
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
+    
+    df_anomalies[[f"{col}_is_anomaly" for col in columns]] = (values < lower_bound) | (values > upper_bound)
     
     return df_anomalies
 
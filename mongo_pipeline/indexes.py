@@ -0,0 +1,12 @@
+"""Index Mongo partagés par la synchro Gold -> Mongo et l'API"""
+
+from typing import Dict, List, Tuple
+
+
+# Index alignés sur les accès de l'API (tri / top-N, dernier refresh), créés une fois puis
+# maintenus par les upserts (create_index est sans effet s'ils existent déjà).
+INDEXES: Dict[str, List[Tuple[str, int]]] = {
+    "facts_ca_pays": [("ca_total", -1)],
+    "kpis_top_produits_ca": [("ca_total", -1)],
+    "metadata_refresh": [("refreshed_at", -1)],
+}
@@ -1,12 +1,13 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from io import BytesIO
-from typing import Dict
+from typing import Dict, Iterator, List, Optional
 
-import pandas as pd
-from pymongo import MongoClient
+import pyarrow.parquet as pq
+from pymongo import MongoClient, ReplaceOne
 
-from flows.config import BUCKET_GOLD, get_minio_client
+from flows.config import BUCKET_GOLD, get_arrow_filesystem
+from mongo_pipeline.indexes import INDEXES
 
 
 KPI_SPECS: Dict[str, str] = {
@@ -40,20 +41,27 @@ ANALYTICS_SPECS: Dict[str, str] = {
 }
 
 
-def read_parquet_from_gold(object_path: str) -> pd.DataFrame:
-    """Lit un Parquet dans le bucket Gold via MinIO et retourne un DataFrame."""
-    client = get_minio_client()
-    response = client.get_object(BUCKET_GOLD, object_path)
-    try:
-        data = response.read()
-    finally:
-        response.close()
-        response.release_conn()
+# Lignes converties et insérées par lot (mémoire bornée quelle que soit la table)
+MONGO_BATCH_SIZE = 50_000
 
-    if not data:
-        return pd.DataFrame()
+# Collections synchronisées en parallèle (I/O MinIO et Mongo, GIL relâché)
+MONGO_SYNC_WORKERS = 4
 
-    return pd.read_parquet(BytesIO(data))
+
+def open_parquet_from_gold(object_path: str) -> pq.ParquetFile:
+    """Ouvre un Parquet du bucket Gold via le système de fichiers S3 Arrow (lecture par row groups)."""
+    return pq.ParquetFile(f"{BUCKET_GOLD}/{object_path}", filesystem=get_arrow_filesystem())
+
+
+def iter_documents(parquet_file: pq.ParquetFile, batch_size: int = MONGO_BATCH_SIZE) -> Iterator[List[dict]]:
+    """
+    Documents Mongo d'un Parquet, par lots de `batch_size` lignes.
+
+    Arrow convertit directement les valeurs nulles (NaN / NaT écrits depuis pandas)
+    en None: pas de passage par un DataFrame ni de nettoyage des NaN.
+    """
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield batch.to_pylist()
 
 
 def get_mongo_client(
@@ -65,47 +73,73 @@ def get_mongo_client(
     return MongoClient(uri)
 
 
-def sync_group(df_specs: Dict[str, str], group: str, db) -> Dict[str, int]:
+def sync_collection(path: str, collection_name: str, db) -> Optional[int]:
     """
-    Synchronise un groupe de tables Gold (kpis, facts, analytics) vers Mongo.
+    Remplace le contenu d'une collection Mongo par une table Gold, lot par lot.
 
     Args:
-        df_specs: mapping nom_logique -> chemin Parquet dans Gold
-        group: "kpis", "facts" ou "analytics"
+        path: Chemin Parquet dans Gold
+        collection_name: Collection cible
         db: instance de base MongoDB
 
     Returns:
-        Dict des nombres de lignes insérées par collection
+        Nombre de documents insérés (None si la table est vide)
     """
-    counts: Dict[str, int] = {}
-
-    for name, path in df_specs.items():
-        collection_name = f"{group}_{name}"
-        print(f"🔄 Sync {group}/{name} depuis {path} vers collection {collection_name}...")
+    print(f"🔄 Sync {path} vers collection {collection_name}...")
+
+    parquet_file = open_parquet_from_gold(path)
+    if parquet_file.metadata.num_rows == 0:
+        print(f"⚠️ Aucune donnée pour {path}, collection ignorée")
+        return None
+
+    # Upserts en place (pas de drop): la collection et ses index restent disponibles
+    # pour l'API pendant le refresh. `_id` = rang de la ligne dans la table Gold: un
+    # document remplacé garde sa place, l'ordre naturel reste celui de la table.
+    coll = db[collection_name]
+    inserted = 0
+    for docs in iter_documents(parquet_file):
+        if docs:
+            operations = []
+            for position, doc in enumerate(docs, start=inserted):
+                doc["_id"] = position
+                operations.append(ReplaceOne({"_id": position}, doc, upsert=True))
+            coll.bulk_write(operations, ordered=False)
+            inserted += len(docs)
 
-        df = read_parquet_from_gold(path)
-        if df.empty:
-            print(f"⚠️ Aucune donnée pour {path}, collection ignorée")
-            continue
+    # Lignes en trop du refresh précédent (et anciens `_id` ObjectId, jamais < inserted)
+    coll.delete_many({"_id": {"$not": {"$lt": inserted}}})
+    if collection_name in INDEXES:
+        coll.create_index(INDEXES[collection_name])
+    print(f"✅ {collection_name}: {inserted} documents insérés")
+    return inserted
 
-        # Remplacer les NaN / NaT par None pour compat MongoDB
-        df_clean = df.where(pd.notnull(df), None)
-        docs = df_clean.to_dict(orient="records")
 
-        # Sécuriser encore au niveau dict (certains NaT peuvent subsister)
-        for doc in docs:
-            for key, value in list(doc.items()):
-                if pd.isna(value):
-                    doc[key] = None
+def sync_group(df_specs: Dict[str, str], group: str, db) -> Dict[str, int]:
+    """
+    Synchronise un groupe de tables Gold (kpis, facts, analytics) vers Mongo.
 
-        coll = db[collection_name]
-        coll.drop()  # on remplace complètement le contenu
-        if docs:
-            coll.insert_many(docs)
-        counts[collection_name] = len(docs)
-        print(f"✅ {collection_name}: {len(docs)} documents insérés")
+    Args:
+        df_specs: mapping nom_logique -> chemin Parquet dans Gold
+        group: "kpis", "facts" ou "analytics"
+        db: instance de base MongoDB
 
-    return counts
+    Returns:
+        Dict des nombres de lignes insérées par collection
+    """
+    # Une tâche par collection: lecture MinIO et écriture Mongo se recouvrent
+    with ThreadPoolExecutor(max_workers=MONGO_SYNC_WORKERS) as executor:
+        futures = {
+            name: executor.submit(sync_collection, path, f"{group}_{name}", db)
+            for name, path in df_specs.items()
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    # Collections dans l'ordre des specs, tables vides ignorées
+    return {
+        f"{group}_{name}": count
+        for name, count in results.items()
+        if count is not None
+    }
 
 
 def run_mongo_sync(
@@ -125,16 +159,25 @@ def run_mongo_sync(
 
     print("🚀 Démarrage de la synchronisation Gold -> MongoDB...")
 
-    results = {
-        "kpis": sync_group(KPI_SPECS, "kpis", db),
-        "facts": sync_group(FACT_SPECS, "facts", db),
-        "analytics": sync_group(ANALYTICS_SPECS, "analytics", db),
+    groups = {
+        "kpis": KPI_SPECS,
+        "facts": FACT_SPECS,
+        "analytics": ANALYTICS_SPECS,
     }
+    # Les trois groupes en parallèle, chacun synchronisant ses collections en parallèle
+    # (client Arrow S3 et pool de connexions pymongo partagés, tous deux thread-safe)
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        futures = {
+            group: executor.submit(sync_group, specs, group, db)
+            for group, specs in groups.items()
+        }
+        results = {group: future.result() for group, future in futures.items()}
 
     duration = time.perf_counter() - start
 
     # Enregistrer les métadonnées
     metadata_coll = db["metadata_refresh"]
+    metadata_coll.create_index(INDEXES["metadata_refresh"])
     doc = {
         "name": "gold_to_mongo_refresh",
         "refreshed_at": datetime.utcnow(),